@@ -0,0 +1,73 @@
+"""
+GhostStream Admin GUI - helper "caldi" in puro Python (pulizia nomi file, estensioni).
+
+Nessuna dipendenza da estensioni C di CPython: gira identico anche su PyPy.
+"""
+
+import re
+
+# Estensioni video riconosciute (tupla: str.endswith la accetta direttamente)
+VIDEO_EXTS = ('.mp4', '.mov', '.avi', '.mkv', '.webm', '.m4v')
+
+# Filtro dei dialoghi file derivato da VIDEO_EXTS (anche maiuscole: su Linux Tk distingue)
+VIDEO_FILETYPES = [
+    ("Video", " ".join(f"*{ext} *{ext.upper()}" for ext in VIDEO_EXTS)),
+    ("Tutti i file", "*.*"),
+]
+
+
+# clean_filename_to_title: separatori -> spazio con translate, poi un solo passaggio
+# regex che toglie i numeri iniziali (es. "001 ") e compatta gli spazi.
+# Implementazione di riferimento: _clean_fast deve produrre lo stesso risultato
+# (verificato in test_gui_fastpath.py).
+_SEP_TRANS = str.maketrans('_-', '  ')
+_RE_LEAD_AND_WS = re.compile(r'^\d+\s*|(\s+)')
+
+
+def _lead_and_ws_repl(m: re.Match) -> str:
+    return ' ' if m.group(1) else ''
+
+
+def _clean_regex(stem: str) -> str:
+    return _RE_LEAD_AND_WS.sub(_lead_and_ws_repl, stem.translate(_SEP_TRANS)).strip().title()
+
+
+def _clean_fast(stem: str) -> str:
+    """Stessa pulizia di _clean_regex in un solo passaggio sui caratteri."""
+    out = []
+    space = False
+    i = 0
+    n = len(stem)
+    # Numeri iniziali (\d = isdecimal) seguiti da separatori/spazi
+    if n and stem[0].isdecimal():
+        while i < n and stem[i].isdecimal():
+            i += 1
+        while i < n and (stem[i] in '_-' or stem[i].isspace()):
+            i += 1
+    for ch in stem[i:]:
+        if ch in '_-' or ch.isspace():
+            space = True
+        else:
+            if space and out:
+                out.append(' ')
+            space = False
+            out.append(ch)
+    # title() resta in C: gestisce maiuscole Unicode come prima
+    return ''.join(out).title()
+
+
+def _stem(basename: str) -> str:
+    """Come Path(basename).stem, senza costruire un Path."""
+    i = basename.rfind('.')
+    return basename[:i] if 0 < i < len(basename) - 1 else basename
+
+
+def clean_filename_to_title(filename: str) -> str:
+    """
+    Converte un nome file (basename) in un titolo leggibile.
+    Es: "video_divertente_01.mp4" -> "Video Divertente 01"
+    """
+    # Rimuovi estensione
+    stem = _stem(filename)
+    name = _clean_fast(stem)
+    return name if name else stem
@@ -17,6 +17,8 @@ Responsibilities:
 
 Features:
 - Apple Silicon hardware acceleration (h264_videotoolbox) on macOS
+- NVENC / QSV / VAAPI hardware encoding when ffmpeg and the GPU support it
+  (libx264 software fallback)
 - Callable API for bulk uploads via ingest_video()
 
 Usage:
@@ -27,38 +29,74 @@ Usage:
 from __future__ import annotations
 
 import argparse
-import base64
+import atexit
+import functools
 import hashlib
-import hmac
 import json
 import os
+import re
 import shutil
 import subprocess
 import sys
 import tempfile
-import uuid
-from dataclasses import dataclass
+import threading
+from collections import deque
+from concurrent.futures import ALL_COMPLETED, ThreadPoolExecutor, wait
+from dataclasses import asdict, dataclass
 from pathlib import Path
-from typing import Any, Optional
+from typing import Any, Callable, Optional
 
-from cryptography.hazmat.primitives.ciphers.aead import AESGCM
+from cryptography.hazmat.primitives.ciphers import Cipher, algorithms, modes
 from dotenv import load_dotenv
 from rich.console import Console
+from rich.progress import DownloadColumn, Progress, TransferSpeedColumn
 from rich.table import Table
 
-from supabase import create_client
-import boto3
+# boto3 / supabase are imported lazily where used: they are slow to import
+# and the GUI only needs ffprobe helpers until the first upload.
 
+try:
+    # SIMD (SSSE3/AVX2) base64, drop-in compatible with the stdlib API
+    import pybase64 as _b64
+except ImportError:
+    import base64 as _b64
+
+try:
+    # Rust/SIMD JSON encoder; emits compact UTF-8 bytes like the fallback below
+    import orjson
+
+    _dumps = orjson.dumps
+except ImportError:
+    def _dumps(obj: Any) -> bytes:
+        return json.dumps(obj, separators=(",", ":"), ensure_ascii=False).encode("utf-8")
 
 console = Console()
 
 
+def _once(fn: Callable[[], Any]) -> Callable[[], Any]:
+    """
+    Cache a zero-argument factory like functools.lru_cache(maxsize=1), but
+    single-flight: lru_cache lets concurrent first callers each build their own
+    value, here they wait for one build and share it (cache_clear() still works).
+    """
+    cached = functools.lru_cache(maxsize=1)(fn)
+    lock = threading.Lock()
+
+    @functools.wraps(fn)
+    def wrapper() -> Any:
+        with lock:
+            return cached()
+
+    wrapper.cache_clear = cached.cache_clear
+    return wrapper
+
+
 def b64_to_bytes(s: str) -> bytes:
-    return base64.b64decode(s.encode("utf-8"))
+    return _b64.b64decode(s.encode("utf-8"))
 
 
 def bytes_to_b64(b: bytes) -> str:
-    return base64.b64encode(b).decode("utf-8")
+    return _b64.b64encode(b).decode("utf-8")
 
 
 def require_env(name: str) -> str:
@@ -68,14 +106,53 @@ def require_env(name: str) -> str:
     return v
 
 
-def run(cmd: list[str]) -> None:
-    proc = subprocess.run(cmd, stdout=subprocess.PIPE, stderr=subprocess.PIPE, text=True)
+def run(cmd: list[str], on_line: Optional[Callable[[str], None]] = None) -> None:
+    """
+    Run a (long) ffmpeg-style command, streaming stderr line by line instead of
+    buffering it: memory stays constant and on_line sees progress live.
+    Only the last 200 lines are kept for the error message.
+    """
+    proc = subprocess.Popen(
+        cmd,
+        stdout=subprocess.DEVNULL,
+        stderr=subprocess.PIPE,
+        text=True,
+        errors="replace",
+        bufsize=1,
+    )
+    # stderr is the only pipe, so draining it here cannot deadlock; universal
+    # newlines also split ffmpeg's \r-terminated progress updates.
+    tail: deque[str] = deque(maxlen=200)
+    with proc:
+        for line in proc.stderr:
+            line = line.rstrip()
+            if not line:
+                continue
+            tail.append(line)
+            if on_line:
+                try:
+                    on_line(line)
+                except Exception:
+                    pass
     if proc.returncode != 0:
+        stderr = "\n".join(tail)
         raise RuntimeError(
-            f"Command failed ({proc.returncode}): {' '.join(cmd)}\n\nSTDERR:\n{proc.stderr}"
+            f"Command failed ({proc.returncode}): {' '.join(cmd)}\n\nSTDERR:\n{stderr}"
         )
 
 
+_FFMPEG_TIME_RE = re.compile(r"time=(\d+):(\d{2}):(\d{2}(?:\.\d+)?)")
+
+
+def ffmpeg_progress_seconds(line: str) -> Optional[float]:
+    """Parse the output timestamp from an ffmpeg stats line ("... time=00:01:02.50 ...")."""
+    m = _FFMPEG_TIME_RE.search(line)
+    if not m:
+        return None
+    h, mnt, sec = m.groups()
+    return int(h) * 3600 + int(mnt) * 60 + float(sec)
+
+
 def run_json(cmd: list[str]) -> dict[str, Any]:
     proc = subprocess.run(cmd, stdout=subprocess.PIPE, stderr=subprocess.PIPE, text=True)
     if proc.returncode != 0:
@@ -96,75 +173,147 @@ class ProbeInfo:
     video_codec: str
     audio_codec: Optional[str]
     container: str
+    fps: Optional[float] = None
+    rotation: int = 0  # display rotation (0/90/180/270); width/height are already as displayed
+    stream_types: tuple[str, ...] = ()  # codec_type of every stream, in order
+    format_tags: tuple[str, ...] = ()  # container-level metadata keys
+    major_brand: str = ""  # ISO BMFF ftyp brand ("isom", "qt", ...)
+
+
+# Video stream + audio stream + container/duration in a single ffprobe call
+_FFPROBE_ARGS = (
+    "ffprobe",
+    "-v",
+    "error",
+    "-show_entries",
+    "stream=codec_type,codec_name,width,height,r_frame_rate:stream_tags=rotate:stream_side_data=rotation"
+    ":format=format_name,duration:format_tags",
+    "-of",
+    "json",
+)
+
+
+# Persistent ffprobe results (re-selecting a file in the GUI skips the subprocess)
+FFPROBE_CACHE_PATH = Path.home() / ".cache" / "ghoststream" / "ffprobe.json"
+FFPROBE_CACHE_MAX_ENTRIES = 2000
+FFPROBE_CACHE_VERSION = 3  # bump when ProbeInfo gains fields
+_ffprobe_disk_lock = threading.Lock()
+_ffprobe_disk: Optional[dict[str, dict[str, Any]]] = None
+_ffprobe_disk_dirty = False
+
+
+def _ffprobe_disk_cache() -> dict[str, dict[str, Any]]:
+    # Caller holds _ffprobe_disk_lock; loaded once per process.
+    global _ffprobe_disk
+    if _ffprobe_disk is None:
+        try:
+            data = json.loads(FFPROBE_CACHE_PATH.read_bytes())
+            _ffprobe_disk = data if isinstance(data, dict) else {}
+        except (OSError, ValueError):
+            _ffprobe_disk = {}
+    return _ffprobe_disk
+
+
+def _ffprobe_disk_get(key: str) -> Optional[ProbeInfo]:
+    with _ffprobe_disk_lock:
+        entry = _ffprobe_disk_cache().get(key)
+    if entry is None:
+        return None
+    try:
+        return ProbeInfo(**{k: tuple(v) if isinstance(v, list) else v for k, v in entry.items()})
+    except TypeError:  # written by an older ProbeInfo layout
+        return None
+
+
+def _ffprobe_disk_put(key: str, info: ProbeInfo) -> None:
+    # Memory only: flush_ffprobe_cache() writes the file once per batch
+    global _ffprobe_disk_dirty
+    with _ffprobe_disk_lock:
+        cache = _ffprobe_disk_cache()
+        cache[key] = asdict(info)
+        while len(cache) > FFPROBE_CACHE_MAX_ENTRIES:
+            cache.pop(next(iter(cache)))  # oldest first
+        _ffprobe_disk_dirty = True
+
+
+def flush_ffprobe_cache() -> None:
+    """
+    Write new ffprobe results to disk (atomic replace). Call once at the end of
+    a batch; it also runs at interpreter exit.
+    """
+    global _ffprobe_disk_dirty
+    with _ffprobe_disk_lock:
+        if not _ffprobe_disk_dirty:
+            return
+        try:
+            FFPROBE_CACHE_PATH.parent.mkdir(parents=True, exist_ok=True)
+            tmp = FFPROBE_CACHE_PATH.with_name(f"{FFPROBE_CACHE_PATH.name}.{os.getpid()}.tmp")
+            tmp.write_bytes(_dumps(_ffprobe_disk_cache()))
+            os.replace(tmp, FFPROBE_CACHE_PATH)
+            _ffprobe_disk_dirty = False
+        except OSError:
+            pass  # best effort: the in-memory cache still works
+
+
+atexit.register(flush_ffprobe_cache)
 
 
-def ffprobe(path: Path) -> ProbeInfo:
+def ffprobe(path: Path, persist: bool = True) -> ProbeInfo:
+    """
+    Probe a media file. Cache key includes mtime + size, so a modified file is
+    probed again; persist=False keeps the result out of the on-disk cache
+    (temporary outputs).
+    """
+    st = path.stat()
+    return _ffprobe_cached(str(path), st.st_mtime_ns, st.st_size, persist)
+
+
+@functools.lru_cache(maxsize=128)
+def _ffprobe_cached(path: str, mtime_ns: int, size: int, persist: bool = True) -> ProbeInfo:
+    key = f"v{FFPROBE_CACHE_VERSION}:{path}:{size}:{mtime_ns}"
+    if persist:
+        cached = _ffprobe_disk_get(key)
+        if cached is not None:
+            return cached
+    info = _run_ffprobe(path)
+    if persist:
+        _ffprobe_disk_put(key, info)
+    return info
+
+
+def _run_ffprobe(path: str) -> ProbeInfo:
     if not shutil.which("ffprobe"):
         raise RuntimeError("ffprobe not found. Please install FFmpeg (ffmpeg + ffprobe).")
 
-    # Video stream
-    v = run_json(
-        [
-            "ffprobe",
-            "-v",
-            "error",
-            "-select_streams",
-            "v:0",
-            "-show_entries",
-            "stream=codec_name,width,height",
-            "-of",
-            "json",
-            str(path),
-        ]
-    )
-    streams = v.get("streams") or []
-    if not streams:
+    probe = run_json([*_FFPROBE_ARGS, path])
+    streams = probe.get("streams") or []
+    vs = next((st for st in streams if st.get("codec_type") == "video"), None)
+    if vs is None:
         raise RuntimeError("No video stream found.")
-    vs = streams[0]
     video_codec = str(vs.get("codec_name") or "").lower()
     width = int(vs.get("width") or 0)
     height = int(vs.get("height") or 0)
     if width <= 0 or height <= 0:
         raise RuntimeError("Invalid video dimensions from ffprobe.")
+    fps = parse_frame_rate(vs.get("r_frame_rate"))
+    rotation = parse_rotation(vs)
+    if rotation in (90, 270):
+        # ffmpeg autorotates on decode: every size decision works on the displayed frame
+        width, height = height, width
 
     # Audio stream (optional)
-    a = run_json(
-        [
-            "ffprobe",
-            "-v",
-            "error",
-            "-select_streams",
-            "a:0",
-            "-show_entries",
-            "stream=codec_name",
-            "-of",
-            "json",
-            str(path),
-        ]
-    )
-    audio_streams = a.get("streams") or []
     audio_codec = None
-    if audio_streams:
-        audio_codec = str(audio_streams[0].get("codec_name") or "").lower()
+    aud = next((st for st in streams if st.get("codec_type") == "audio"), None)
+    if aud is not None:
+        audio_codec = str(aud.get("codec_name") or "").lower()
 
     # Container + duration
-    f = run_json(
-        [
-            "ffprobe",
-            "-v",
-            "error",
-            "-show_entries",
-            "format=format_name,duration",
-            "-of",
-            "json",
-            str(path),
-        ]
-    )
-    fmt = f.get("format") or {}
+    fmt = probe.get("format") or {}
     container = str(fmt.get("format_name") or "").lower()
     duration = float(fmt.get("duration") or 0.0)
     if duration <= 0:
         raise RuntimeError("Invalid duration from ffprobe.")
+    tags = fmt.get("tags") or {}
 
     return ProbeInfo(
         duration_seconds=duration,
@@ -173,9 +322,61 @@ def ffprobe(path: Path) -> ProbeInfo:
         video_codec=video_codec,
         audio_codec=audio_codec,
         container=container,
+        fps=fps,
+        rotation=rotation,
+        stream_types=tuple(str(st.get("codec_type") or "") for st in streams),
+        format_tags=tuple(sorted(tags)),
+        major_brand=str(tags.get("major_brand") or "").strip().lower(),
     )
 
 
+# format_name ffprobe reports for any file read by the mov/mp4 demuxer
+MP4_FORMAT_NAME = "mov,mp4,m4a,3gp,3g2,mj2"
+# ftyp brands of real MP4 files (QuickTime is "qt")
+MP4_BRANDS = frozenset({"isom", "iso2", "iso4", "iso5", "iso6", "mp41", "mp42", "avc1", "m4v"})
+# Container tags the MP4 muxer writes itself; anything else (GPS location,
+# creation_time, device make/model, ...) is stripped by the remux
+MP4_STRUCTURAL_TAGS = frozenset({"major_brand", "minor_version", "compatible_brands", "encoder"})
+
+
+def can_upload_as_is(inp: ProbeInfo) -> bool:
+    """
+    True when a faststart source needs no remux at all: a real MP4 brand, one
+    video stream, at most one audio stream, nothing else and no metadata to strip.
+    """
+    videos = inp.stream_types.count("video")
+    audios = inp.stream_types.count("audio")
+    return (
+        inp.major_brand in MP4_BRANDS
+        and videos == 1
+        and audios <= 1
+        and len(inp.stream_types) == videos + audios
+        and set(inp.format_tags) <= MP4_STRUCTURAL_TAGS
+    )
+
+
+def parse_rotation(stream: dict) -> int:
+    """Display rotation of a video stream in degrees (0/90/180/270)."""
+    # Display matrix side data (current ffmpeg), else the legacy "rotate" tag
+    for sd in stream.get("side_data_list") or []:
+        if "rotation" in sd:
+            return round(float(sd["rotation"])) % 360
+    try:
+        return round(float((stream.get("tags") or {}).get("rotate") or 0)) % 360
+    except ValueError:
+        return 0
+
+
+def parse_frame_rate(rate: Any) -> Optional[float]:
+    """Parse ffprobe's "30000/1001"; None when missing or implausible (e.g. VFR timebases)."""
+    try:
+        num, _, den = str(rate).partition("/")
+        fps = float(num) / float(den or 1)
+    except (TypeError, ValueError, ZeroDivisionError):
+        return None
+    return fps if 1 <= fps <= 120 else None
+
+
 def is_mp4_container(container: str) -> bool:
     # ffprobe may return "mov,mp4,m4a,3gp,3g2,mj2"
     return "mp4" in container.split(",") or "mov" in container.split(",")
@@ -185,7 +386,7 @@ def choose_cap(duration_seconds: float) -> int:
     return 720 if duration_seconds < 600 else 480
 
 
-def make_scale_filter(cap: int) -> str:
+def make_scale_filter(cap: int, encoder: str = "x264") -> str:
     # IMPORTANT:
     # - This filter is ONLY applied when input_height > cap (downscale needed),
     #   so it can never upscale.
@@ -193,6 +394,17 @@ def make_scale_filter(cap: int) -> str:
     #   explicit and avoid accidental upscaling if this logic is refactored later.
     #
     # Keep aspect ratio and force even width.
+    # Hardware encoders receive decoded frames already on the device
+    # (see get_hwaccel_args), so they scale there instead of round-tripping
+    # through system memory.
+    if encoder == "nvenc":
+        if nvenc_scale_filter() == "scale_npp":
+            return f"scale_npp=-2:'min({cap},ih)':format=nv12:interp_algo=lanczos"
+        return f"scale_cuda=-2:'min({cap},ih)':format=nv12"
+    if encoder == "vaapi":
+        return f"scale_vaapi=w=-2:h='min({cap},ih)':format=nv12"
+    if encoder == "qsv":
+        return f"scale_qsv=w=-2:h='min({cap},ih)'"
     return f"scale=-2:'min({cap},ih)'"
 
 
@@ -201,6 +413,7 @@ def ensure_ffmpeg() -> None:
         raise RuntimeError("ffmpeg not found. Please install FFmpeg (ffmpeg + ffprobe).")
 
 
+@functools.lru_cache(maxsize=1)
 def is_apple_silicon() -> bool:
     """Check if running on macOS with Apple Silicon (M1/M2/M3)."""
     if sys.platform != "darwin":
@@ -213,24 +426,446 @@ def is_apple_silicon() -> bool:
         return False
 
 
-def get_encoder_settings(use_hardware: bool = True) -> list[str]:
+# Encoders fed with frames in system memory (need an explicit -pix_fmt).
+SOFTWARE_FRAME_ENCODERS = ("x264", "videotoolbox")
+
+
+def vaapi_device() -> str:
+    return os.getenv("GS_VAAPI_DEVICE", "/dev/dri/renderD128")
+
+
+@_once
+def probe_ffmpeg_hw() -> tuple[frozenset[str], frozenset[str]]:
+    """Return (hwaccels, encoders) supported by the local ffmpeg build."""
+    def capture(args: list[str]) -> str:
+        proc = subprocess.run(
+            ["ffmpeg", "-hide_banner", *args],
+            stdout=subprocess.PIPE,
+            stderr=subprocess.DEVNULL,
+            text=True,
+        )
+        return proc.stdout if proc.returncode == 0 else ""
+
+    # "Hardware acceleration methods:" followed by one method per line
+    hwaccels = frozenset(
+        line.strip() for line in capture(["-hwaccels"]).splitlines()[1:] if line.strip()
+    )
+    # " V....D h264_nvenc           NVIDIA NVENC H.264 encoder (codec h264)"
+    encoders = frozenset(
+        parts[1]
+        for parts in (line.split() for line in capture(["-encoders"]).splitlines())
+        if len(parts) >= 2 and parts[0].startswith("V")
+    )
+    return hwaccels, encoders
+
+
+@_once
+def probe_ffmpeg_filters() -> frozenset[str]:
+    """Filter names of the local ffmpeg build (empty if ffmpeg cannot run)."""
+    try:
+        proc = subprocess.run(
+            ["ffmpeg", "-hide_banner", "-filters"],
+            stdout=subprocess.PIPE,
+            stderr=subprocess.DEVNULL,
+            text=True,
+        )
+    except OSError:
+        return frozenset()
+    # " ... scale_cuda        V->V       GPU accelerated video resizer"
+    return frozenset(
+        parts[1]
+        for parts in (line.split() for line in proc.stdout.splitlines())
+        if len(parts) >= 3 and "->" in parts[2]
+    )
+
+
+def nvenc_scale_filter() -> Optional[str]:
+    """
+    GPU scaler for CUDA frames: scale_cuda ships with every CUDA-enabled build,
+    scale_npp only with nonfree libnpp ones. None = scale on the CPU.
+    """
+    filters = probe_ffmpeg_filters()
+    for name in ("scale_cuda", "scale_npp"):
+        if name in filters:
+            return name
+    return None
+
+
+def hw_encoder_works(encoder: str) -> bool:
+    """
+    Encode one synthetic frame with the hardware encoder. Distro ffmpeg builds
+    list h264_nvenc/qsv/vaapi even when there is no matching device.
+    """
+    src = ["-f", "lavfi", "-i", "nullsrc=s=256x256:d=1", "-frames:v", "1"]
+    if encoder == "vaapi":
+        args = ["-vaapi_device", vaapi_device(), *src, "-vf", "format=nv12,hwupload", "-c:v", "h264_vaapi"]
+    else:
+        args = [*src, "-vf", "format=nv12", "-c:v", f"h264_{encoder}"]
+    try:
+        proc = subprocess.run(
+            ["ffmpeg", "-hide_banner", "-loglevel", "error", *args, "-f", "null", "-"],
+            stdout=subprocess.DEVNULL,
+            stderr=subprocess.DEVNULL,
+            timeout=20,
+        )
+    except (OSError, subprocess.TimeoutExpired):
+        return False
+    return proc.returncode == 0
+
+
+@_once
+def detect_hw_encoder() -> str:
+    """
+    Pick the H.264 encoder for this machine.
+    Returns one of "videotoolbox", "nvenc", "qsv", "vaapi" or "x264" (software).
+    Hardware encoders must be listed by ffmpeg and pass a one-frame test encode.
+    """
+    if is_apple_silicon():
+        return "videotoolbox"
+    try:
+        hwaccels, encoders = probe_ffmpeg_hw()
+    except OSError:
+        return "x264"
+    candidates = (
+        ("nvenc", "h264_nvenc" in encoders and "cuda" in hwaccels),
+        ("qsv", "h264_qsv" in encoders and "qsv" in hwaccels),
+        ("vaapi", "h264_vaapi" in encoders and "vaapi" in hwaccels and os.path.exists(vaapi_device())),
+    )
+    for encoder, listed in candidates:
+        if listed and hw_encoder_works(encoder):
+            if encoder == "nvenc":
+                probe_ffmpeg_filters()  # GPU scaler choice, see nvenc_scale_filter
+            return encoder
+    return "x264"
+
+
+# Concurrent encodes per device. VideoToolbox sessions share the single media
+# engine; consumer NVIDIA cards cap NVENC sessions, and QSV/VAAPI saturate the
+# fixed-function block with a couple of streams.
+HW_ENCODE_SLOTS = {"videotoolbox": 1, "nvenc": 3, "qsv": 2, "vaapi": 2}
+
+
+def encode_slot_count(encoder: str) -> int:
+    env = os.getenv("GS_ENCODE_SLOTS")
+    if env and env.isdigit() and int(env) > 0:
+        return int(env)
+    if encoder in HW_ENCODE_SLOTS:
+        return HW_ENCODE_SLOTS[encoder]
+    # libx264 already spreads one encode over every core (-threads 0); a second
+    # job only fills the gaps of its serial stages on bigger machines
+    return 2 if (os.cpu_count() or 1) >= 8 else 1
+
+
+@_once
+def encode_slots() -> threading.BoundedSemaphore:
+    """
+    Concurrent ffmpeg jobs allowed when ingest_video() runs on several threads.
+    Single-flight, so every worker gets the same semaphore and the hardware
+    test encodes run only once.
+    """
+    return threading.BoundedSemaphore(encode_slot_count(detect_hw_encoder()))
+
+
+def get_hwaccel_args(encoder: str) -> list[str]:
+    """Input-side ffmpeg options: decode on the same device that encodes."""
+    if encoder == "nvenc":
+        return ["-hwaccel", "cuda", "-hwaccel_output_format", "cuda"]
+    if encoder == "vaapi":
+        return [
+            "-hwaccel", "vaapi",
+            "-hwaccel_device", vaapi_device(),
+            "-hwaccel_output_format", "vaapi",
+        ]
+    if encoder == "qsv":
+        return ["-hwaccel", "qsv", "-hwaccel_output_format", "qsv"]
+    return []
+
+
+def get_encoder_settings(
+    encoder: str,
+    gop: int = 120,
+    x264_profile: tuple[str, str, str] = ("veryfast", "23", "fastdecode"),
+) -> list[str]:
     """
     Return ffmpeg encoder settings.
-    Uses h264_videotoolbox on Apple Silicon for 5-10x faster encoding.
-    Falls back to libx264 on other platforms.
+    Uses h264_videotoolbox on Apple Silicon and NVENC/QSV/VAAPI where available
+    for 5-20x faster encoding. Falls back to libx264 on other platforms.
+    x264_profile is (preset, crf, tune) and only applies to libx264.
     """
-    if use_hardware and is_apple_silicon():
+    if encoder == "videotoolbox":
         return [
             "-c:v", "h264_videotoolbox",
             "-b:v", "2500k",       # Target bitrate (good for 720p mobile)
             "-allow_sw", "1",     # Fallback to software if HW fails
+            "-g", str(gop),
         ]
-    else:
+    if encoder == "nvenc":
+        return [
+            "-c:v", "h264_nvenc",
+            "-preset", "p5",
+            "-rc", "vbr",
+            "-cq", "23",
+            "-b:v", "0",
+            "-g", str(gop),
+        ]
+    if encoder == "qsv":
+        return [
+            "-c:v", "h264_qsv",
+            "-preset", "medium",
+            "-global_quality", "23",
+            "-g", str(gop),
+        ]
+    if encoder == "vaapi":
         return [
-            "-c:v", "libx264",
-            "-preset", "fast",
-            "-crf", "23",
+            "-c:v", "h264_vaapi",
+            "-qp", "23",
+            "-g", str(gop),
         ]
+    preset, crf, tune = x264_profile
+    return [
+        "-c:v", "libx264",
+        "-preset", os.getenv("GS_X264_PRESET") or preset,
+        "-tune", tune,
+        "-profile:v", "main",
+        "-level", "4.1",
+        "-crf", crf,
+        "-threads", "0",         # use all cores
+        "-x264-params", f"keyint={gop}:min-keyint={gop}:scenecut=0",
+    ]
+
+
+def choose_x264_profile(inp: ProbeInfo, cap: int) -> tuple[str, str, str]:
+    """(preset, crf, tune) for libx264 by input class."""
+    if inp.height >= 1080 and inp.duration_seconds >= 1800:
+        # Long HD source squeezed to 480p: cheap frames, spend the CPU on compression
+        return ("medium", "24", "film")
+    if min(inp.height, cap) <= 480 and inp.duration_seconds < 600:
+        # Short, small output: bits are cheap, go fast
+        return ("veryfast", "25", "fastdecode")
+    return ("veryfast", "23", "fastdecode")  # fastdecode: cheaper decode in Telegram WebView
+
+
+def build_encode_args(inp: ProbeInfo, cap: int, encoder: str) -> list[str]:
+    """Encoder argv specialized for this input: x264 class profile + 2-second GOP."""
+    gop = round(inp.fps * 2) if inp.fps else 120
+    return get_encoder_settings(encoder, gop=gop, x264_profile=choose_x264_profile(inp, cap))
+
+
+def thumbnail_ts(duration_seconds: float) -> float:
+    return min(max(0.5, duration_seconds * 0.1), 5.0)
+
+
+def thumbnail_output_args(inp: ProbeInfo, out_jpg: Path, hw_frames: bool = False) -> list[str]:
+    # Thumbnail (no upscale)
+    # If already small, keep original (no scale filter). If larger, downscale to 360p height.
+    # The output height never exceeds the input height, so deciding on the input is equivalent.
+    filters = []
+    if hw_frames:
+        # Decoded frames live on the GPU; the JPEG encoder needs them in system memory.
+        filters += ["hwdownload", "format=nv12"]
+    if inp.height > 360:
+        filters.append("scale=-2:360")
+    args = ["-frames:v", "1", "-q:v", "4"]
+    if filters:
+        args += ["-vf", ",".join(filters)]
+    return args + [str(out_jpg)]
+
+
+def has_faststart(path: Path) -> bool:
+    """True if the top-level `moov` box precedes `mdat` (already web optimized)."""
+    with open(path, "rb") as fh:
+        while True:
+            header = fh.read(8)
+            if len(header) < 8:
+                return False
+            size = int.from_bytes(header[:4], "big")
+            box = header[4:]
+            if box == b"moov":
+                return True
+            if box == b"mdat":
+                return False
+            if size == 1:  # 64-bit largesize follows the type
+                size = int.from_bytes(fh.read(8), "big")
+                fh.seek(size - 16, os.SEEK_CUR)
+            elif size >= 8:
+                fh.seek(size - 8, os.SEEK_CUR)
+            else:  # 0 = box runs to EOF, <8 = corrupt
+                return False
+
+
+def build_thumbnail_cmd(src: Path, out_jpg: Path, inp: ProbeInfo) -> list[str]:
+    return [
+        "ffmpeg", "-hide_banner", "-loglevel", "warning", "-stats", "-y",
+        "-ss", f"{thumbnail_ts(inp.duration_seconds):.2f}", "-i", str(src),
+        "-map", "0:v:0",
+        *thumbnail_output_args(inp, out_jpg),
+    ]
+
+
+def build_remux_cmd(src: Path, out_mp4: Path, out_jpg: Path, inp: ProbeInfo) -> list[str]:
+    # Still enforce faststart remux (no re-encode); the thumbnail comes from a
+    # second, input-seeked reader of the same source in the same invocation.
+    return [
+        "ffmpeg", "-hide_banner", "-loglevel", "warning", "-stats", "-y",
+        "-i", str(src),
+        "-ss", f"{thumbnail_ts(inp.duration_seconds):.2f}", "-i", str(src),
+        "-map", "0:v:0", "-map", "0:a:0?", "-map_metadata", "-1",
+        "-c", "copy", "-movflags", "+faststart",
+        str(out_mp4),
+        "-map", "1:v:0",
+        *thumbnail_output_args(inp, out_jpg),
+    ]
+
+
+def build_encode_cmd(
+    src: Path,
+    out_mp4: Path,
+    out_jpg: Path,
+    inp: ProbeInfo,
+    cap: int,
+    encoder: str,
+) -> list[str]:
+    # Re-encode to H.264/AAC, apply NO-UPSCALE cap expression, and faststart
+    # IMPORTANT (No-Upscale + "no needless downscale"):
+    # - If input height <= cap, we DO NOT apply any scale filter (preserve original res).
+    # - If input height  > cap, we downscale to cap.
+    # Autorotate cannot run on device frames: rotated sources decode and scale
+    # on the CPU and only the encode runs on the device. Same for a downscale
+    # on an ffmpeg build without a CUDA scaler.
+    device_frames = (
+        encoder not in SOFTWARE_FRAME_ENCODERS
+        and not inp.rotation
+        and not (encoder == "nvenc" and inp.height > cap and nvenc_scale_filter() is None)
+    )
+    filters = []
+    if inp.height > cap:
+        filters.append(make_scale_filter(cap, encoder if device_frames else "x264"))
+    if encoder == "vaapi" and not device_frames:
+        filters += ["format=nv12", "hwupload"]
+    vf = ",".join(filters)
+
+    cmd = ["ffmpeg", "-hide_banner", "-loglevel", "warning", "-stats", "-y"]
+    if device_frames:
+        cmd += get_hwaccel_args(encoder)
+    elif encoder == "vaapi":
+        cmd += ["-vaapi_device", vaapi_device()]
+    cmd += ["-i", str(src)]
+    cmd += ["-map", "0:v:0", "-map", "0:a:0?", "-map_metadata", "-1"]
+
+    # Add encoder settings (hardware or CPU fallback)
+    cmd += build_encode_args(inp, cap, encoder)
+
+    # Common settings (hardware paths already produce nv12 on the device)
+    if encoder in SOFTWARE_FRAME_ENCODERS:
+        cmd += ["-pix_fmt", "yuv420p"]
+    elif not device_frames and encoder != "vaapi":
+        cmd += ["-pix_fmt", "nv12"]
+    cmd += ["-movflags", "+faststart", "-max_muxing_queue_size", "1024"]
+    if vf:
+        cmd += ["-vf", vf]
+    if inp.audio_codec is None:
+        cmd += ["-an"]
+    else:
+        cmd += ["-c:a", "aac", "-b:a", "128k"]
+    cmd += [str(out_mp4)]
+
+    # Second output: the thumbnail shares the decoder with the encode instead
+    # of re-opening and re-decoding out_mp4. Output-side -ss drops frames
+    # until the timestamp.
+    cmd += ["-map", "0:v:0", "-ss", f"{thumbnail_ts(inp.duration_seconds):.2f}"]
+    cmd += thumbnail_output_args(inp, out_jpg, hw_frames=device_frames)
+    return cmd
+
+
+def encode_mp4(
+    src: Path,
+    out_mp4: Path,
+    out_jpg: Path,
+    inp: ProbeInfo,
+    cap: int,
+    on_line: Optional[Callable[[str], None]] = None,
+) -> str:
+    """
+    Re-encode src into out_mp4 (plus the out_jpg thumbnail) with the best available encoder.
+    A failing hardware path (unsupported input, busy or missing device) is
+    retried once with libx264. Returns the encoder actually used.
+    """
+    encoder = detect_hw_encoder()
+    try:
+        run(build_encode_cmd(src, out_mp4, out_jpg, inp, cap, encoder), on_line)
+    except RuntimeError:
+        if encoder in SOFTWARE_FRAME_ENCODERS:
+            raise
+        console.print(f"[yellow]{encoder} encode failed, falling back to libx264[/yellow]")
+        encoder = "x264"
+        run(build_encode_cmd(src, out_mp4, out_jpg, inp, cap, encoder), on_line)
+    return encoder
+
+
+def predict_output_info(inp: ProbeInfo, cap: int, reencoded: bool, as_is: bool = False) -> ProbeInfo:
+    """
+    Output properties implied by the ffmpeg command we just ran, without
+    probing the file again (see --verify for a real ffprobe).
+    as_is: the source itself is uploaded (see can_upload_as_is).
+    """
+    if as_is:
+        return inp
+    # What our MP4 muxer writes: first video + first audio, no global metadata
+    muxed = dict(
+        container=MP4_FORMAT_NAME,
+        stream_types=("video", "audio") if inp.audio_codec else ("video",),
+        major_brand="isom",
+        fps=inp.fps,
+    )
+    if not reencoded:
+        # Stream copy: same codecs and dimensions
+        return ProbeInfo(
+            duration_seconds=inp.duration_seconds,
+            width=inp.width,
+            height=inp.height,
+            video_codec=inp.video_codec,
+            audio_codec=inp.audio_codec,
+            **muxed,
+        )
+    height = inp.height if inp.height <= cap else cap
+    width = inp.width
+    if height != inp.height:
+        # scale=-2:h keeps the aspect ratio and rounds the width to the nearest even
+        # value, half-up in integers like av_rescale (not Python's half-even round)
+        width = (inp.width * height + inp.height) // (2 * inp.height) * 2
+    return ProbeInfo(
+        duration_seconds=inp.duration_seconds,
+        width=width,
+        height=height,
+        video_codec="h264",
+        audio_codec="aac" if inp.audio_codec else None,
+        **muxed,
+    )
+
+
+# /dev/shm must hold the output + thumbnail of this ingest, with room for a few
+# parallel ones (Docker's default /dev/shm is only 64 MB).
+SHM_HEADROOM_FACTOR = 3
+
+
+def work_dir_root(src_size: int = 0, override: Optional[str] = None) -> Optional[str]:
+    """
+    Parent directory for the per-ingest temp dir. override (--tmpdir) or
+    GS_TMPDIR win; otherwise RAM-backed /dev/shm is used when it has at least
+    SHM_HEADROOM_FACTOR x the source size free, so the encoded MP4 is not
+    written to and read back from disk. Falls back to the system temp dir.
+    """
+    explicit = override or os.getenv("GS_TMPDIR")
+    if explicit:
+        return explicit
+    if os.path.isdir("/dev/shm"):
+        try:
+            free = shutil.disk_usage("/dev/shm").free
+        except OSError:
+            free = 0
+        if free >= SHM_HEADROOM_FACTOR * src_size:
+            return "/dev/shm"
+    return tempfile.gettempdir()
 
 
 def render_plan_table(inp: ProbeInfo, cap: int, will_reencode: bool, skip_compress: bool) -> None:
@@ -244,37 +879,80 @@ def render_plan_table(inp: ProbeInfo, cap: int, will_reencode: bool, skip_compre
     t.add_row("Policy cap (height)", f"{cap}p")
     t.add_row("--skip-compress", str(skip_compress))
     t.add_row("Will re-encode", str(will_reencode))
+    if will_reencode:
+        t.add_row("Encoder", detect_hw_encoder())
     console.print(t)
 
 
-def encrypt_title_envelope_b64(title: str, aes_key_b64: str) -> str:
+# Binary title envelope: version(1) || iv(12) || ct+tag, base64-encoded once.
+# The legacy JSON envelope always starts with "{", so decoders can tell them apart.
+ENVELOPE_BINARY_V1 = b"\x01"
+
+
+@functools.lru_cache(maxsize=4)
+def _title_cipher(aes_key_b64: str) -> tuple[algorithms.AES256, bytes]:
     key = b64_to_bytes(aes_key_b64)
     if len(key) != 32:
         raise RuntimeError("GS_AES_KEY_B64 must decode to 32 bytes (AES-256).")
-    aesgcm = AESGCM(key)
+    return algorithms.AES256(key), ENVELOPE_BINARY_V1
+
+
+def encrypt_title_envelope_b64(title: str, aes_key_b64: str, legacy: bool = False) -> str:
+    aes_key, version = _title_cipher(aes_key_b64)
     iv = os.urandom(12)
-    ct = aesgcm.encrypt(iv, title.encode("utf-8"), None)  # includes auth tag
+    encryptor = Cipher(aes_key, modes.GCM(iv)).encryptor()
+    ct = encryptor.update(title.encode("utf-8")) + encryptor.finalize()
+    ct += encryptor.tag  # same ct || tag layout as AESGCM.encrypt / WebCrypto
+    if not legacy:
+        return bytes_to_b64(version + iv + ct)
     env = {"v": 1, "alg": "A256GCM", "iv_b64": bytes_to_b64(iv), "ct_b64": bytes_to_b64(ct)}
-    env_json = json.dumps(env, separators=(",", ":"), ensure_ascii=False).encode("utf-8")
+    env_json = _dumps(env)
     return bytes_to_b64(env_json)
 
 
 def normalize_tag(tag: str) -> str:
+    # Must match normalizeTagToken() in supabase/functions/_shared/crypto.ts
     return tag.strip().lower()
 
 
-def compute_tag_hmac_hex(tag: str, key_b64: str) -> str:
-    key = b64_to_bytes(key_b64)
-    token = normalize_tag(tag)
-    if not token:
-        raise RuntimeError("Empty tag token after normalization.")
-    return hmac.new(key, token.encode("utf-8"), hashlib.sha256).hexdigest()
+def parse_tags(tags: str) -> list[str]:
+    """Comma-separated tags -> normalized tokens, empty ones dropped."""
+    return [t for t in map(normalize_tag, tags.split(",")) if t]
+
+
+_SHA256_BLOCK = 64
+_TRANS_36 = bytes(x ^ 0x36 for x in range(256))
+_TRANS_5C = bytes(x ^ 0x5C for x in range(256))
+
+
+def hmac_many(tokens: list[bytes], key: bytes) -> list[str]:
+    """
+    HMAC-SHA256 hex digests of many tokens under one key (RFC 2104).
+    The ipad/opad states are hashed once and copied per token, so each tag
+    costs two C-level SHA-256 finalizations and no hmac.HMAC construction.
+    """
+    if len(key) > _SHA256_BLOCK:
+        key = hashlib.sha256(key).digest()
+    key = key.ljust(_SHA256_BLOCK, b"\0")
+    inner = hashlib.sha256(key.translate(_TRANS_36))
+    outer = hashlib.sha256(key.translate(_TRANS_5C))
+    out = []
+    for tok in tokens:
+        h = inner.copy()
+        h.update(tok)
+        o = outer.copy()
+        o.update(h.digest())
+        out.append(o.hexdigest())
+    return out
 
 
 def build_r2_client() -> Any:
     endpoint = require_env("R2_ENDPOINT")
     access_key = require_env("R2_ACCESS_KEY_ID")
     secret_key = require_env("R2_SECRET_ACCESS_KEY")
+    import boto3
+    from botocore.config import Config as BotoConfig
+
     # R2 commonly uses region_name="auto"
     return boto3.client(
         "s3",
@@ -282,6 +960,100 @@ def build_r2_client() -> Any:
         aws_access_key_id=access_key,
         aws_secret_access_key=secret_key,
         region_name=os.getenv("R2_REGION", "auto"),
+        # Keep a warm keep-alive pool for parallel parts and successive uploads
+        config=BotoConfig(
+            max_pool_connections=32,
+            retries={"mode": "adaptive", "max_attempts": 5},
+            tcp_keepalive=True,
+        ),
+    )
+
+
+@_once
+def get_r2_client() -> Any:
+    """
+    Process-wide R2 client. Using a boto3 client from many threads is safe,
+    creating one on the default session is not: _once serializes the build
+    (GUI prewarm thread vs. the first bulk workers).
+    """
+    return build_r2_client()
+
+
+@_once
+def get_supabase_client() -> Any:
+    """Process-wide Supabase client, reused across ingests in the same session."""
+    # Accept both SUPABASE_URL and URL (Supabase dashboard doesn't allow SUPABASE_ prefix)
+    supabase_url = os.getenv("SUPABASE_URL") or require_env("URL")
+    supabase_key = os.getenv("SUPABASE_SERVICE_ROLE_KEY") or require_env("SERVICE_ROLE_KEY")
+    from supabase import ClientOptions, create_client
+
+    # postgrest-py keeps one pooled HTTP/2 session per client; caching the client
+    # keeps that connection warm across ingests.
+    return create_client(
+        supabase_url,
+        supabase_key,
+        options=ClientOptions(postgrest_client_timeout=30, schema="public"),
+    )
+
+
+def sha256_file(path: Path) -> str:
+    """Streaming SHA-256 (OpenSSL, SHA-NI where available) of a file."""
+    with open(path, "rb") as fh:
+        if hasattr(hashlib, "file_digest"):  # Python 3.11+
+            return hashlib.file_digest(fh, "sha256").hexdigest()
+        h = hashlib.sha256()
+        for chunk in iter(lambda: fh.read(1024 * 1024), b""):
+            h.update(chunk)
+        return h.hexdigest()
+
+
+def content_keys(digest: str, video_prefix: str, thumb_prefix: str) -> tuple[str, str]:
+    """Content-addressed R2 keys: the same MP4 always maps to the same objects."""
+    video_key = f"{video_prefix.rstrip('/')}/{digest[:2]}/{digest}.mp4"
+    thumb_key = f"{thumb_prefix.rstrip('/')}/{digest[:2]}/{digest}.jpg"
+    return video_key, thumb_key
+
+
+def r2_object_exists(r2: Any, bucket: str, key: str) -> bool:
+    from botocore.exceptions import ClientError
+
+    try:
+        r2.head_object(Bucket=bucket, Key=key)
+        return True
+    except ClientError as e:
+        if e.response.get("Error", {}).get("Code") in ("404", "NoSuchKey", "NotFound"):
+            return False
+        raise
+
+
+def find_video_by_sha256(sb: Any, digest: str) -> Optional[str]:
+    """Id of an already ingested video with the same MP4 content, if any."""
+    res = sb.table("videos").select("id").eq("content_sha256", digest).limit(1).execute()
+    return res.data[0]["id"] if res.data else None
+
+
+def insert_video_with_tags(sb: Any, video_row: dict[str, Any], tag_hmacs: list[str]) -> str:
+    """Insert the video row and its tag tokens in one round trip (see schema.sql)."""
+    res = sb.rpc("insert_video_with_tags", {"v": video_row, "tags": tag_hmacs}).execute()
+    if not res.data or not isinstance(res.data, str):
+        raise RuntimeError(f"Unexpected insert response: {res}")
+    return res.data
+
+
+# Objects below this size go up as a single PUT (no multipart bookkeeping).
+R2_MULTIPART_THRESHOLD = 64 * 1024 * 1024
+
+
+@functools.lru_cache(maxsize=1)
+def r2_transfer_config() -> Any:
+    from boto3.s3.transfer import TransferConfig
+
+    return TransferConfig(
+        multipart_threshold=R2_MULTIPART_THRESHOLD,
+        multipart_chunksize=64 * 1024 * 1024,
+        max_concurrency=16,
+        io_chunksize=1024 * 1024,  # larger socket writes than the 256 KiB default
+        use_threads=True,
     )
 
 
@@ -292,18 +1064,83 @@ def upload_file_r2(
     file_path: Path,
     content_type: str,
     dry_run: bool,
+    callback: Optional[Callable[[int], None]] = None,
+    skip_existing: bool = False,
 ) -> None:
+    """
+    Upload one object; callback(bytes_sent) is called as data goes out.
+    With skip_existing, an object already present under key is left alone.
+    """
     if dry_run:
         console.print(f"[yellow]DRY RUN[/yellow] Upload {file_path} -> s3://{bucket}/{key} ({content_type})")
         return
+    size = file_path.stat().st_size
+    if skip_existing and r2_object_exists(r2, bucket, key):
+        console.print(f"[cyan]Already in R2[/cyan] s3://{bucket}/{key}")
+        if callback:
+            callback(size)
+        return
+    if size < R2_MULTIPART_THRESHOLD:
+        with open(file_path, "rb") as fh:
+            r2.put_object(Bucket=bucket, Key=key, Body=fh, ContentType=content_type)
+        if callback:
+            callback(size)
+        return
     r2.upload_file(
         Filename=str(file_path),
         Bucket=bucket,
         Key=key,
         ExtraArgs={"ContentType": content_type},
+        Config=r2_transfer_config(),
+        Callback=callback,
     )
 
 
+def upload_media_r2(
+    r2: Any,
+    bucket: str,
+    video_key: str,
+    video_path: Path,
+    thumb_key: str,
+    thumb_path: Path,
+    dry_run: bool,
+    on_progress: Optional[Callable[[int, int], None]] = None,
+) -> None:
+    """
+    Upload MP4 + thumbnail concurrently (boto3 releases the GIL on socket I/O),
+    so the wall time is max(mp4, thumb) instead of their sum. Large MP4s are
+    sent as multipart uploads with parallel parts. Keys are content-addressed,
+    so objects that already exist are skipped.
+    on_progress(bytes_done, bytes_total) aggregates both transfers and fires
+    once per whole percent: boto3 reports every ~8 KB read.
+    """
+    callback = None
+    if on_progress and not dry_run:
+        total = video_path.stat().st_size + thumb_path.stat().st_size
+        done = 0
+        last_pct = -1
+        lock = threading.Lock()
+
+        def callback(n: int) -> None:
+            nonlocal done, last_pct
+            with lock:
+                done += n
+                pct = done * 100 // total if total else 100
+                if pct == last_pct:
+                    return
+                last_pct = pct
+                on_progress(done, total)
+
+    with ThreadPoolExecutor(max_workers=2) as ex:
+        futures = [
+            ex.submit(upload_file_r2, r2, bucket, video_key, video_path, "video/mp4", dry_run, callback, True),
+            ex.submit(upload_file_r2, r2, bucket, thumb_key, thumb_path, "image/jpeg", dry_run, callback, True),
+        ]
+        wait(futures, return_when=ALL_COMPLETED)
+    for f in futures:
+        f.result()  # re-raise the first upload error, if any
+
+
 @dataclass
 class IngestResult:
     """Result of a video ingestion operation."""
@@ -312,6 +1149,7 @@ class IngestResult:
     error: Optional[str] = None
     video_key: Optional[str] = None
     thumb_key: Optional[str] = None
+    duplicate: bool = False  # same MP4 content was already ingested
 
 
 def ingest_video(
@@ -323,6 +1161,10 @@ def ingest_video(
     video_prefix: str = "videos",
     thumb_prefix: str = "thumbs",
     progress_callback: Optional[callable] = None,
+    legacy_envelope: bool = False,
+    log_callback: Optional[Callable[[str], None]] = None,
+    verify: bool = False,
+    tmp_dir: Optional[str] = None,
 ) -> IngestResult:
     """
     Ingest a single video file programmatically.
@@ -336,14 +1178,22 @@ def ingest_video(
         video_prefix: R2 prefix for video objects
         thumb_prefix: R2 prefix for thumbnail objects
         progress_callback: Optional callback(stage: str, percent: int) for progress updates
+        legacy_envelope: Store the title as the legacy base64 JSON envelope
+        log_callback: Optional callback(line: str) for ffmpeg warnings/errors as they happen
+        verify: Re-probe the output with ffprobe instead of deriving it from the command
+        tmp_dir: Scratch directory for intermediates (default: see work_dir_root)
     
     Returns:
         IngestResult with success status and details
     """
     load_dotenv()
     
+    last_report = [None]
+    
     def report(stage: str, percent: int = 0):
-        if progress_callback:
+        # Forward only real changes: upload/ffmpeg progress maps many raw events to one percent
+        if progress_callback and last_report[0] != (stage, percent):
+            last_report[0] = (stage, percent)
             try:
                 progress_callback(stage, percent)
             except Exception:
@@ -368,35 +1218,39 @@ def ingest_video(
         will_reencode = (not skip_compress) or (not input_is_compliant)
         
         # Create processed outputs in a temp dir
-        with tempfile.TemporaryDirectory(prefix="ghoststream_ingest_") as td:
+        work_root = work_dir_root(src.stat().st_size, tmp_dir)
+        with tempfile.TemporaryDirectory(prefix="ghoststream_ingest_", dir=work_root) as td:
             work = Path(td)
             out_mp4 = work / "out.mp4"
             out_jpg = work / "thumb.jpg"
             
-            report("Compressione video..." if will_reencode else "Ottimizzazione...", 10)
+            stage = "Compressione video..." if will_reencode else "Ottimizzazione..."
+            report(stage, 10)
             
-            if skip_compress and input_is_compliant:
-                run([
-                    "ffmpeg", "-y", "-i", str(src),
-                    "-c", "copy", "-movflags", "+faststart",
-                    str(out_mp4),
-                ])
-            else:
-                vf = make_scale_filter(cap) if inp.height > cap else None
-                cmd = ["ffmpeg", "-y", "-i", str(src)]
-                cmd += get_encoder_settings(use_hardware=True)
-                cmd += ["-pix_fmt", "yuv420p", "-movflags", "+faststart"]
-                if vf:
-                    cmd += ["-vf", vf]
-                if inp.audio_codec is None:
-                    cmd += ["-an"]
+            def on_ffmpeg_line(line: str):
+                # Stats lines drive the progress bar (10% -> 50%), the rest goes to the log
+                pos = ffmpeg_progress_seconds(line)
+                if pos is not None:
+                    report(stage, 10 + int(40 * min(1.0, pos / inp.duration_seconds)))
+                elif log_callback:
+                    log_callback(line)
+            
+            # Only the ffmpeg stage is gated; hashing/upload of other videos runs in parallel
+            with encode_slots():
+                if skip_compress and input_is_compliant and can_upload_as_is(inp) and has_faststart(src):
+                    # Already web optimized: upload the source as-is, only extract the thumbnail
+                    out_mp4 = src
+                    run(build_thumbnail_cmd(src, out_jpg, inp), on_ffmpeg_line)
+                elif skip_compress and input_is_compliant:
+                    run(build_remux_cmd(src, out_mp4, out_jpg, inp), on_ffmpeg_line)
                 else:
-                    cmd += ["-c:a", "aac", "-b:a", "128k"]
-                cmd += [str(out_mp4)]
-                run(cmd)
+                    encode_mp4(src, out_mp4, out_jpg, inp, cap, on_ffmpeg_line)
             
-            report("Verifica output...", 50)
-            out_info = ffprobe(out_mp4)
+            if verify:
+                report("Verifica output...", 50)
+                out_info = ffprobe(out_mp4, persist=False)
+            else:
+                out_info = predict_output_info(inp, cap, will_reencode, as_is=out_mp4 == src)
             
             # NO-UPSCALE invariant
             if out_info.height > inp.height:
@@ -412,38 +1266,22 @@ def ingest_video(
             if not is_mp4_container(out_info.container):
                 return IngestResult(success=False, error=f"Output container not MP4/MOV: {out_info.container}")
             
-            report("Generazione thumbnail...", 55)
-            
-            # Thumbnail
-            thumb_ts = min(max(0.5, out_info.duration_seconds * 0.1), 5.0)
-            thumb_vf = "scale=-2:360" if out_info.height > 360 else None
-            thumb_cmd = [
-                "ffmpeg", "-y", "-ss", f"{thumb_ts:.2f}",
-                "-i", str(out_mp4), "-vframes", "1", "-q:v", "4",
-            ]
-            if thumb_vf:
-                thumb_cmd += ["-vf", thumb_vf]
-            thumb_cmd += [str(out_jpg)]
-            run(thumb_cmd)
-            
             report("Cifratura metadati...", 60)
             
             # Encrypt title + compute tag HMACs
             aes_key_b64 = os.getenv("AES_KEY_B64") or require_env("GS_AES_KEY_B64")
             tag_key_b64 = os.getenv("TAG_HMAC_KEY_B64") or require_env("GS_TAG_HMAC_KEY_B64")
             
-            title_enc = encrypt_title_envelope_b64(title, aes_key_b64)
-            raw_tags = [t.strip() for t in tags.split(",")]
-            tag_tokens = [t for t in (normalize_tag(x) for x in raw_tags) if t]
+            title_enc = encrypt_title_envelope_b64(title, aes_key_b64, legacy=legacy_envelope)
+            tag_tokens = parse_tags(tags)
             if not tag_tokens:
                 return IngestResult(success=False, error="No valid tags provided after normalization.")
             
-            tag_hmacs = [compute_tag_hmac_hex(t, tag_key_b64) for t in tag_tokens]
+            tag_hmacs = hmac_many([t.encode("utf-8") for t in tag_tokens], b64_to_bytes(tag_key_b64))
             
-            # Prepare keys
-            obj_id = str(uuid.uuid4())
-            video_key = f"{video_prefix.rstrip('/')}/{obj_id}.mp4"
-            thumb_key = f"{thumb_prefix.rstrip('/')}/{obj_id}.jpg"
+            # Prepare keys (content-addressed)
+            digest = sha256_file(out_mp4)
+            video_key, thumb_key = content_keys(digest, video_prefix, thumb_prefix)
             
             if dry_run:
                 return IngestResult(
@@ -453,23 +1291,31 @@ def ingest_video(
                     thumb_key=thumb_key,
                 )
             
-            report("Upload video su R2...", 65)
+            sb = get_supabase_client()
+            existing_id = find_video_by_sha256(sb, digest)
+            if existing_id:
+                report("Già presente", 100)
+                return IngestResult(
+                    success=True,
+                    video_id=existing_id,
+                    video_key=video_key,
+                    thumb_key=thumb_key,
+                    duplicate=True,
+                )
+            
+            report("Upload su R2...", 65)
             
             # Upload to R2
             r2_bucket = require_env("R2_BUCKET")
-            r2 = build_r2_client()
-            upload_file_r2(r2, r2_bucket, video_key, out_mp4, "video/mp4", False)
-            
-            report("Upload thumbnail...", 85)
-            upload_file_r2(r2, r2_bucket, thumb_key, out_jpg, "image/jpeg", False)
+            r2 = get_r2_client()
+            upload_media_r2(
+                r2, r2_bucket, video_key, out_mp4, thumb_key, out_jpg, False,
+                on_progress=lambda done, total: report("Upload su R2...", 65 + 25 * done // total),
+            )
             
             report("Salvataggio database...", 90)
             
             # Insert into Supabase
-            supabase_url = os.getenv("SUPABASE_URL") or require_env("URL")
-            supabase_key = os.getenv("SUPABASE_SERVICE_ROLE_KEY") or require_env("SERVICE_ROLE_KEY")
-            sb = create_client(supabase_url, supabase_key)
-            
             video_row = {
                 "title_enc": title_enc,
                 "duration_seconds": int(round(out_info.duration_seconds)),
@@ -478,17 +1324,11 @@ def ingest_video(
                 "r2_bucket": r2_bucket,
                 "r2_video_key": video_key,
                 "r2_thumb_key": thumb_key,
+                "content_sha256": digest,
                 "published": True,
             }
             
-            inserted = sb.table("videos").insert(video_row).execute()
-            if not inserted.data or len(inserted.data) != 1:
-                return IngestResult(success=False, error=f"Unexpected insert response: {inserted}")
-            
-            video_id = inserted.data[0]["id"]
-            
-            tag_rows = [{"video_id": video_id, "tag_hmac": h} for h in tag_hmacs]
-            sb.table("video_tag_tokens").insert(tag_rows).execute()
+            video_id = insert_video_with_tags(sb, video_row, tag_hmacs)
             
             report("Completato!", 100)
             
@@ -514,6 +1354,13 @@ def main() -> int:
     p.add_argument("--dry-run", action="store_true", help="Do not upload or write to DB.")
     p.add_argument("--video-prefix", default="videos", help="R2 prefix for MP4 objects.")
     p.add_argument("--thumb-prefix", default="thumbs", help="R2 prefix for thumbnail objects.")
+    p.add_argument(
+        "--legacy-envelope",
+        action="store_true",
+        help="Store title_enc as the legacy base64 JSON envelope (for old Edge Functions).",
+    )
+    p.add_argument("--verify", action="store_true", help="Re-probe the output with ffprobe before upload.")
+    p.add_argument("--tmpdir", help="Scratch directory for intermediates (overrides GS_TMPDIR and /dev/shm).")
     args = p.parse_args()
 
     src = Path(args.file).expanduser().resolve()
@@ -535,54 +1382,24 @@ def main() -> int:
     render_plan_table(inp, cap, will_reencode=will_reencode, skip_compress=args.skip_compress)
 
     # Create processed outputs in a temp dir
-    with tempfile.TemporaryDirectory(prefix="ghoststream_ingest_") as td:
+    work_root = work_dir_root(src.stat().st_size, args.tmpdir)
+    with tempfile.TemporaryDirectory(prefix="ghoststream_ingest_", dir=work_root) as td:
         work = Path(td)
         out_mp4 = work / "out.mp4"
         out_jpg = work / "thumb.jpg"
 
-        if args.skip_compress and input_is_compliant:
-            # Still enforce faststart remux (no re-encode)
-            run(
-                [
-                    "ffmpeg",
-                    "-y",
-                    "-i",
-                    str(src),
-                    "-c",
-                    "copy",
-                    "-movflags",
-                    "+faststart",
-                    str(out_mp4),
-                ]
-            )
+        if args.skip_compress and input_is_compliant and can_upload_as_is(inp) and has_faststart(src):
+            # Already web optimized: upload the source as-is, only extract the thumbnail
+            out_mp4 = src
+            run(build_thumbnail_cmd(src, out_jpg, inp))
+        elif args.skip_compress and input_is_compliant:
+            run(build_remux_cmd(src, out_mp4, out_jpg, inp))
         else:
-            # Re-encode to H.264/AAC, apply NO-UPSCALE cap expression, and faststart
-            # IMPORTANT (No-Upscale + "no needless downscale"):
-            # - If input height <= cap, we DO NOT apply any scale filter (preserve original res).
-            # - If input height  > cap, we downscale to cap.
-            vf = make_scale_filter(cap) if inp.height > cap else None
-            
-            # Build ffmpeg command with platform-optimized encoder
-            cmd = ["ffmpeg", "-y", "-i", str(src)]
-            
-            # Add encoder settings (Apple Silicon or CPU fallback)
-            cmd += get_encoder_settings(use_hardware=True)
-            
-            # Common settings
-            cmd += [
-                "-pix_fmt", "yuv420p",
-                "-movflags", "+faststart",
-            ]
-            if vf:
-                cmd += ["-vf", vf]
-            if inp.audio_codec is None:
-                cmd += ["-an"]
-            else:
-                cmd += ["-c:a", "aac", "-b:a", "128k"]
-            cmd += [str(out_mp4)]
-            run(cmd)
+            encode_mp4(src, out_mp4, out_jpg, inp, cap)
 
-        out_info = ffprobe(out_mp4)
+        out_info = ffprobe(out_mp4, persist=False) if args.verify else predict_output_info(
+            inp, cap, will_reencode, as_is=out_mp4 == src
+        )
 
         # NO-UPSCALE invariant (height and width must not exceed input)
         if out_info.height > inp.height:
@@ -602,57 +1419,48 @@ def main() -> int:
         if not is_mp4_container(out_info.container):
             raise RuntimeError(f"Output container not MP4/MOV: {out_info.container}")
 
-        # Thumbnail (no upscale)
-        thumb_ts = min(max(0.5, out_info.duration_seconds * 0.1), 5.0)
-        # If already small, keep original (no scale filter). If larger, downscale to 360p height.
-        thumb_vf = "scale=-2:360" if out_info.height > 360 else None
-        thumb_cmd = [
-            "ffmpeg",
-            "-y",
-            "-ss",
-            f"{thumb_ts:.2f}",
-            "-i",
-            str(out_mp4),
-            "-vframes",
-            "1",
-            "-q:v",
-            "4",
-        ]
-        if thumb_vf:
-            thumb_cmd += ["-vf", thumb_vf]
-        thumb_cmd += [str(out_jpg)]
-        run(thumb_cmd)
-
         # Encrypt title + compute tag HMACs
         # Prefer shared names (used by Edge Functions) but keep GS_* aliases for convenience.
         aes_key_b64 = os.getenv("AES_KEY_B64") or require_env("GS_AES_KEY_B64")
         tag_key_b64 = os.getenv("TAG_HMAC_KEY_B64") or require_env("GS_TAG_HMAC_KEY_B64")
 
-        title_enc = encrypt_title_envelope_b64(args.title, aes_key_b64)
-        raw_tags = [t.strip() for t in args.tags.split(",")]
-        tag_tokens = [t for t in (normalize_tag(x) for x in raw_tags) if t]
+        title_enc = encrypt_title_envelope_b64(args.title, aes_key_b64, legacy=args.legacy_envelope)
+        tag_tokens = parse_tags(args.tags)
         if not tag_tokens:
             raise RuntimeError("No valid tags provided after normalization.")
 
-        tag_hmacs = [compute_tag_hmac_hex(t, tag_key_b64) for t in tag_tokens]
+        tag_hmacs = hmac_many([t.encode("utf-8") for t in tag_tokens], b64_to_bytes(tag_key_b64))
 
-        # Prepare keys
-        obj_id = str(uuid.uuid4())
-        video_key = f"{args.video_prefix.rstrip('/')}/{obj_id}.mp4"
-        thumb_key = f"{args.thumb_prefix.rstrip('/')}/{obj_id}.jpg"
+        # Prepare keys (content-addressed: re-ingesting the same MP4 is a no-op)
+        digest = sha256_file(out_mp4)
+        video_key, thumb_key = content_keys(digest, args.video_prefix, args.thumb_prefix)
+
+        sb = get_supabase_client()
+        if not args.dry_run:
+            existing_id = find_video_by_sha256(sb, digest)
+            if existing_id:
+                console.print(f"[cyan]Already ingested[/cyan] video_id: {existing_id} (sha256 {digest[:12]}…)")
+                return 0
 
         # Upload to R2
         r2_bucket = require_env("R2_BUCKET")
-        r2 = build_r2_client()
-        upload_file_r2(r2, r2_bucket, video_key, out_mp4, "video/mp4", args.dry_run)
-        upload_file_r2(r2, r2_bucket, thumb_key, out_jpg, "image/jpeg", args.dry_run)
+        r2 = get_r2_client()
+        if args.dry_run:
+            upload_media_r2(r2, r2_bucket, video_key, out_mp4, thumb_key, out_jpg, True)
+        else:
+            with Progress(
+                *Progress.get_default_columns(),
+                DownloadColumn(),
+                TransferSpeedColumn(),
+                console=console,
+            ) as bar:
+                task = bar.add_task("Upload R2", total=None)
+                upload_media_r2(
+                    r2, r2_bucket, video_key, out_mp4, thumb_key, out_jpg, False,
+                    on_progress=lambda done, total: bar.update(task, completed=done, total=total),
+                )
 
         # Insert into Supabase
-        # Accept both SUPABASE_URL and URL (Supabase dashboard doesn't allow SUPABASE_ prefix)
-        supabase_url = os.getenv("SUPABASE_URL") or require_env("URL")
-        supabase_key = os.getenv("SUPABASE_SERVICE_ROLE_KEY") or require_env("SERVICE_ROLE_KEY")
-        sb = create_client(supabase_url, supabase_key)
-
         video_row = {
             "title_enc": title_enc,
             "duration_seconds": int(round(out_info.duration_seconds)),
@@ -661,6 +1469,7 @@ def main() -> int:
             "r2_bucket": r2_bucket,
             "r2_video_key": video_key,
             "r2_thumb_key": thumb_key,
+            "content_sha256": digest,
             "published": True,
         }
 
@@ -669,13 +1478,7 @@ def main() -> int:
             console.print("[yellow]DRY RUN[/yellow] Would insert tag tokens:", tag_tokens)
             return 0
 
-        inserted = sb.table("videos").insert(video_row).execute()
-        if not inserted.data or len(inserted.data) != 1:
-            raise RuntimeError(f"Unexpected insert response: {inserted}")
-        video_id = inserted.data[0]["id"]
-
-        tag_rows = [{"video_id": video_id, "tag_hmac": h} for h in tag_hmacs]
-        sb.table("video_tag_tokens").insert(tag_rows).execute()
+        video_id = insert_video_with_tags(sb, video_row, tag_hmacs)
 
         console.print("[green]Ingestion complete[/green]")
         console.print(f"video_id: {video_id}")
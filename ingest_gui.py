@@ -13,14 +13,23 @@ Doppio click su questo file per aprirlo, oppure:
 """
 
 import os
+import queue
 import sys
 import threading
+import time
 import tkinter as tk
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, as_completed, wait
 from tkinter import filedialog, messagebox, ttk
 from pathlib import Path
-from typing import List, Optional, Callable
+from typing import Dict, List, Optional, Callable, Set
 from dataclasses import dataclass
-import re
+
+# Bytecode cache: scrivi sempre i .pyc (avvii successivi più rapidi). Se la
+# cartella dello script non è scrivibile e PYTHONPYCACHEPREFIX non è impostato,
+# usa una cache nella home.
+sys.dont_write_bytecode = False
+if sys.pycache_prefix is None and not os.access(os.path.dirname(os.path.abspath(__file__)), os.W_OK):
+    sys.pycache_prefix = os.path.join(os.path.expanduser("~"), ".cache", "ghoststream", "pycache")
 
 # Carica .env prima di tutto
 try:
@@ -29,25 +38,50 @@ try:
 except ImportError:
     pass
 
+def show_missing_dependency(e: ImportError):
+    messagebox.showerror(
+        "Dipendenze mancanti",
+        f"Errore: {e}\n\nEsegui nel terminale:\npip3 install -r requirements.txt"
+    )
+
+
 # Verifica che le dipendenze siano installate
 try:
     from ingest import (
         ingest_video, 
         IngestResult,
         ffprobe, 
+        flush_ffprobe_cache,
         choose_cap, 
         is_mp4_container,
-        is_apple_silicon,
+        detect_hw_encoder,
+        get_r2_client,
+        get_supabase_client,
     )
 except ImportError as e:
     root = tk.Tk()
     root.withdraw()
-    messagebox.showerror(
-        "Dipendenze mancanti",
-        f"Errore: {e}\n\nEsegui nel terminale:\npip3 install -r requirements.txt"
-    )
+    show_missing_dependency(e)
     sys.exit(1)
 
+# Helper in puro Python (nessuna estensione C): la GUI gira anche su PyPy
+from gui_fastpath import VIDEO_EXTS, VIDEO_FILETYPES, clean_filename_to_title
+
+# Video elaborati in parallelo nel tab Bulk (ffmpeg e upload rilasciano il GIL)
+DEFAULT_BULK_WORKERS = min(4, os.cpu_count() or 1)
+
+# Etichetta dell'header del tab Bulk per ogni valore di detect_hw_encoder()
+ENCODER_LABELS = {
+    "videotoolbox": "🚀 Apple Silicon rilevato - Encoding hardware attivo (VideoToolbox)",
+    "nvenc": "🚀 GPU NVIDIA rilevata - Encoding hardware attivo (NVENC)",
+    "qsv": "🚀 Intel Quick Sync rilevato - Encoding hardware attivo",
+    "vaapi": "🚀 VA-API rilevato - Encoding hardware attivo",
+    "x264": "⚙️ Encoding software (CPU)",
+}
+
+# Righe massime conservate nel pannello di log
+LOG_MAX_LINES = 2000
+
 
 @dataclass
 class VideoItem:
@@ -59,29 +93,38 @@ class VideoItem:
     error: Optional[str] = None
 
 
-def clean_filename_to_title(filename: str) -> str:
+class ProgressThrottle:
     """
-    Converte un nome file in un titolo leggibile.
-    Es: "video_divertente_01.mp4" -> "Video Divertente 01"
+    Filtro per le callback di progresso dei worker: max ~30 aggiornamenti/s
+    (oltre, Tk passa il tempo a ridisegnare). Cambi di fase e 100% passano
+    sempre, le percentuali ripetute mai.
     """
-    # Rimuovi estensione
-    name = Path(filename).stem
-    # Sostituisci underscore e trattini con spazi
-    name = re.sub(r'[_\-]+', ' ', name)
-    # Rimuovi numeri iniziali tipo "001_" 
-    name = re.sub(r'^\d+\s*', '', name)
-    # Capitalizza ogni parola
-    name = name.title()
-    # Pulisci spazi multipli
-    name = re.sub(r'\s+', ' ', name).strip()
-    return name if name else Path(filename).stem
+    
+    def __init__(self, interval: float = 1 / 30):
+        self.interval = interval
+        self._last_ts = 0.0  # condiviso tra i job: il limite è per finestra
+    
+    def allow(self, last: list, stage: str, percent: int) -> bool:
+        """last = [fase, percentuale] dell'ultimo aggiornamento inoltrato per questo job."""
+        now = time.monotonic()
+        if stage == last[0]:
+            if percent == last[1]:
+                return False
+            if percent < 100 and now - self._last_ts < self.interval:
+                return False
+        last[0], last[1] = stage, percent
+        self._last_ts = now
+        return True
 
 
 class EditableTreeview(ttk.Treeview):
     """Treeview con celle editabili per titolo e tag."""
     
-    def __init__(self, parent, **kwargs):
+    def __init__(self, parent, on_edit: Optional[Callable[[str, str, str], None]] = None, **kwargs):
         super().__init__(parent, **kwargs)
+        self._on_edit = on_edit  # on_edit(item, nome_colonna, valore)
+        # "#1" -> "file", "#2" -> "title", ...
+        self._column_names = {f"#{i}": name for i, name in enumerate(self["columns"], 1)}
         self._entry = None
         self._editing_item = None
         self._editing_column = None
@@ -123,9 +166,7 @@ class EditableTreeview(ttk.Treeview):
         x, y, width, height = bbox
         
         # Ottieni il valore corrente
-        col_idx = int(column.replace('#', '')) - 1
-        values = list(self.item(item, 'values'))
-        current_value = values[col_idx] if col_idx < len(values) else ""
+        current_value = self.set(item, self._column_names[column])
         
         # Crea Entry widget
         self._entry = ttk.Entry(self, width=width)
@@ -144,14 +185,11 @@ class EditableTreeview(ttk.Treeview):
             return
         
         new_value = self._entry.get()
-        col_idx = int(self._editing_column.replace('#', '')) - 1
-        
-        values = list(self.item(self._editing_item, 'values'))
-        while len(values) <= col_idx:
-            values.append("")
-        values[col_idx] = new_value
+        column_name = self._column_names[self._editing_column]
         
-        self.item(self._editing_item, values=values)
+        self.set(self._editing_item, column_name, new_value)
+        if self._on_edit:
+            self._on_edit(self._editing_item, column_name, new_value)
         
         self._cleanup_edit()
     
@@ -177,27 +215,28 @@ class BulkTab(ttk.Frame):
         self.is_processing = False
         self.should_stop = False
         self.videos: List[VideoItem] = []
+        # self.videos è la fonte di verità; la tabella mostra solo le righe visibili
+        self._by_path: Dict[str, VideoItem] = {}  # dedupe O(1)
+        self._selected: Set[str] = set()  # path selezionati (anche fuori vista)
+        self._top = 0  # indice in self.videos della prima riga mostrata
+        self._render_pending = False
+        self._ui_throttle = ProgressThrottle()
         
         self._create_widgets()
     
     def _create_widgets(self):
-        # === Header con info Apple Silicon ===
+        # === Header con l'encoder in uso ===
         header_frame = ttk.Frame(self)
         header_frame.pack(fill=tk.X, pady=(0, 10))
         
-        if is_apple_silicon():
-            hw_label = ttk.Label(
-                header_frame, 
-                text="🚀 Apple Silicon rilevato - Encoding hardware attivo",
-                foreground="green"
-            )
-        else:
-            hw_label = ttk.Label(
-                header_frame, 
-                text="⚙️ Encoding software (CPU)",
-                foreground="gray"
-            )
-        hw_label.pack(side=tk.LEFT)
+        self.hw_label = ttk.Label(
+            header_frame,
+            text="🔍 Rilevamento encoder...",
+            foreground="gray"
+        )
+        self.hw_label.pack(side=tk.LEFT)
+        # Il test encode dura qualche secondo: fuori dal thread Tk
+        threading.Thread(target=self._detect_encoder, daemon=True).start()
         
         # === Pulsanti di selezione file ===
         btn_frame = ttk.Frame(self)
@@ -217,6 +256,13 @@ class BulkTab(ttk.Frame):
         )
         add_folder_btn.pack(side=tk.LEFT, padx=2)
         
+        add_tree_btn = ttk.Button(
+            btn_frame,
+            text="🌳 Aggiungi Albero",
+            command=self._add_tree
+        )
+        add_tree_btn.pack(side=tk.LEFT, padx=2)
+        
         clear_btn = ttk.Button(
             btn_frame,
             text="🗑️ Svuota Lista",
@@ -240,12 +286,26 @@ class BulkTab(ttk.Frame):
         global_tags_entry.pack(fill=tk.X)
         ttk.Label(tags_frame, text="Es: funny, viral, memes", foreground="gray").pack(anchor=tk.W)
         
+        # === Parallelismo ===
+        workers_frame = ttk.Frame(self)
+        workers_frame.pack(fill=tk.X, pady=5)
+        
+        ttk.Label(workers_frame, text="Video in parallelo:").pack(side=tk.LEFT)
+        self.workers_var = tk.IntVar(value=DEFAULT_BULK_WORKERS)
+        ttk.Spinbox(
+            workers_frame,
+            from_=1,
+            to=16,
+            width=4,
+            textvariable=self.workers_var
+        ).pack(side=tk.LEFT, padx=5)
+        
         # === Tabella Video ===
         table_frame = ttk.LabelFrame(self, text="Video da Caricare (doppio click per modificare Titolo/Tags)", padding=5)
         table_frame.pack(fill=tk.BOTH, expand=True, pady=5)
         
-        # Scrollbar
-        scroll_y = ttk.Scrollbar(table_frame, orient=tk.VERTICAL)
+        # Scrollbar (verticale gestita da _yview: la tabella è virtualizzata)
+        self.scroll_y = scroll_y = ttk.Scrollbar(table_frame, orient=tk.VERTICAL)
         scroll_y.pack(side=tk.RIGHT, fill=tk.Y)
         
         scroll_x = ttk.Scrollbar(table_frame, orient=tk.HORIZONTAL)
@@ -256,12 +316,12 @@ class BulkTab(ttk.Frame):
             table_frame,
             columns=("file", "title", "tags", "status"),
             show="headings",
-            yscrollcommand=scroll_y.set,
             xscrollcommand=scroll_x.set,
-            selectmode="extended"
+            selectmode="extended",
+            on_edit=self._on_cell_edit
         )
         
-        scroll_y.config(command=self.tree.yview)
+        scroll_y.config(command=self._yview)
         scroll_x.config(command=self.tree.xview)
         
         # Configura colonne
@@ -277,6 +337,11 @@ class BulkTab(ttk.Frame):
         
         self.tree.pack(fill=tk.BOTH, expand=True)
         
+        self.tree.bind('<Configure>', lambda e: self._schedule_render())
+        self.tree.bind('<<TreeviewSelect>>', self._on_select)
+        for seq in ('<MouseWheel>', '<Button-4>', '<Button-5>'):
+            self.tree.bind(seq, self._on_wheel)
+        
         # === Progress ===
         progress_frame = ttk.Frame(self)
         progress_frame.pack(fill=tk.X, pady=5)
@@ -319,13 +384,20 @@ class BulkTab(ttk.Frame):
         )
         self.test_btn.pack(side=tk.LEFT, expand=True, fill=tk.X, padx=2)
     
+    def _detect_encoder(self):
+        try:
+            encoder = detect_hw_encoder()
+        except Exception:
+            encoder = "x264"
+        self.after(0, self._show_encoder, encoder)
+    
+    def _show_encoder(self, encoder: str):
+        text = ENCODER_LABELS.get(encoder, ENCODER_LABELS["x264"])
+        self.hw_label.config(text=text, foreground="gray" if encoder == "x264" else "green")
+    
     def _add_files(self):
         """Apre dialogo per selezionare più file."""
-        filetypes = [
-            ("Video", "*.mp4 *.mov *.avi *.mkv *.webm *.m4v"),
-            ("Tutti i file", "*.*")
-        ]
-        files = filedialog.askopenfilenames(filetypes=filetypes)
+        files = filedialog.askopenfilenames(filetypes=VIDEO_FILETYPES)
         for f in files:
             self._add_video(f)
     
@@ -335,31 +407,87 @@ class BulkTab(ttk.Frame):
         if not folder:
             return
         
-        video_extensions = {'.mp4', '.mov', '.avi', '.mkv', '.webm', '.m4v'}
-        folder_path = Path(folder)
-        
         added = 0
-        for f in folder_path.iterdir():
-            if f.is_file() and f.suffix.lower() in video_extensions:
-                self._add_video(str(f))
-                added += 1
+        # scandir: is_file() usa il tipo restituito da getdents, niente stat per file
+        with os.scandir(folder) as it:
+            for entry in it:
+                if entry.is_file(follow_symlinks=False) and entry.name.lower().endswith(VIDEO_EXTS):
+                    added += self._add_video(entry.path)
         
         if added == 0:
             messagebox.showinfo("Info", "Nessun video trovato nella cartella selezionata.")
         else:
             self.log(f"Aggiunti {added} video dalla cartella")
     
-    def _add_video(self, file_path: str):
-        """Aggiunge un video alla lista."""
+    def _add_tree(self):
+        """Aggiunge i video di una cartella e di tutte le sottocartelle (in background)."""
+        folder = filedialog.askdirectory()
+        if not folder:
+            return
+        
+        found: "queue.Queue[Optional[str]]" = queue.Queue()
+        threading.Thread(target=self._walk_tree, args=(folder, found), daemon=True).start()
+        self.log(f"🔍 Scansione di {folder}...")
+        self.after(50, self._drain_folder_queue, found, 0)
+    
+    @staticmethod
+    def _walk_tree(folder: str, found: "queue.Queue[Optional[str]]"):
+        """Visita ricorsiva con più scandir in parallelo (utile su NAS/SMB); None = fine."""
+        def scan(path: str) -> List[str]:
+            subdirs = []
+            try:
+                with os.scandir(path) as it:
+                    for entry in it:
+                        try:
+                            if entry.is_dir(follow_symlinks=False):
+                                subdirs.append(entry.path)
+                            elif entry.is_file(follow_symlinks=False) and entry.name.lower().endswith(VIDEO_EXTS):
+                                found.put(entry.path)
+                        except OSError:
+                            continue
+            except OSError:
+                pass  # cartella non leggibile: saltala
+            return subdirs
+        
+        try:
+            with ThreadPoolExecutor(max_workers=8) as ex:
+                pending = {ex.submit(scan, folder)}
+                while pending:
+                    done, pending = wait(pending, return_when=FIRST_COMPLETED)
+                    for fut in done:
+                        pending.update(ex.submit(scan, sub) for sub in fut.result())
+        finally:
+            found.put(None)
+    
+    def _drain_folder_queue(self, found: "queue.Queue[Optional[str]]", added: int):
+        """Inserisce i file trovati dal walker a blocchi di 100; added = nuovi finora."""
+        for _ in range(100):
+            try:
+                path = found.get_nowait()
+            except queue.Empty:
+                break
+            if path is None:
+                if added == 0:
+                    messagebox.showinfo("Info", "Nessun nuovo video trovato nell'albero selezionato.")
+                else:
+                    self.log(f"Aggiunti {added} video dall'albero")
+                return
+            added += self._add_video(path)
+        self.after(50, self._drain_folder_queue, found, added)
+    
+    def _add_video(self, file_path: str) -> bool:
+        """Aggiunge un video alla lista; False se era già presente."""
         # Controlla se già presente
-        for item in self.tree.get_children():
-            if self.tree.item(item, 'values')[0] == file_path:
-                return  # Già presente
+        if file_path in self._by_path:
+            return False
         
-        filename = Path(file_path).name
-        title = clean_filename_to_title(filename)
+        title = clean_filename_to_title(os.path.basename(file_path))
         
-        self.tree.insert("", tk.END, values=(file_path, title, "", "⏳ In coda"))
+        video = VideoItem(file_path=file_path, title=title, tags="")
+        self.videos.append(video)
+        self._by_path[file_path] = video
+        self._schedule_render()
+        return True
     
     def _clear_list(self):
         """Svuota la lista."""
@@ -367,8 +495,12 @@ class BulkTab(ttk.Frame):
             messagebox.showwarning("Attenzione", "Upload in corso, impossibile svuotare.")
             return
         
-        for item in self.tree.get_children():
-            self.tree.delete(item)
+        self._commit_edit()
+        self.videos.clear()
+        self._by_path.clear()
+        self._selected.clear()
+        self._top = 0
+        self._render()
     
     def _remove_selected(self):
         """Rimuove gli elementi selezionati."""
@@ -376,24 +508,142 @@ class BulkTab(ttk.Frame):
             messagebox.showwarning("Attenzione", "Upload in corso, impossibile rimuovere.")
             return
         
-        selected = self.tree.selection()
-        for item in selected:
-            self.tree.delete(item)
-    
-    def _get_all_items(self) -> List[tuple]:
-        """Ottiene tutti gli elementi della tabella."""
-        items = []
-        for item_id in self.tree.get_children():
-            values = self.tree.item(item_id, 'values')
-            items.append((item_id, values))
-        return items
-    
-    def _update_item_status(self, item_id: str, status: str):
-        """Aggiorna lo stato di un elemento."""
-        values = list(self.tree.item(item_id, 'values'))
-        values[3] = status
-        self.tree.item(item_id, values=values)
-        self.tree.see(item_id)
+        if not self._selected:
+            return
+        self._commit_edit()
+        self.videos = [v for v in self.videos if v.file_path not in self._selected]
+        for path in self._selected:
+            self._by_path.pop(path, None)
+        self._selected.clear()
+        self._render()
+    
+    def _update_item_status(self, idx: int, status: str):
+        """Aggiorna lo stato di un elemento e lo porta in vista."""
+        self.videos[idx].status = status
+        self._see(idx)
+        k = idx - self._top
+        if 0 <= k < len(self.tree.get_children()):
+            self.tree.set(f"r{k}", "status", status)
+    
+    # --- Tabella virtualizzata: slot fissi "r0".."rK" riempiti da self.videos[self._top:] ---
+    
+    def _visible_count(self) -> int:
+        """Righe che entrano nell'area visibile del Treeview."""
+        height = self.tree.winfo_height()
+        if height <= 1:  # non ancora mappato
+            return 20
+        slots = self.tree.get_children()
+        bbox = self.tree.bbox(slots[0]) if slots else ""
+        header, row_h = (bbox[1], bbox[3]) if bbox else (25, 20)
+        return max(1, (height - header) // max(1, row_h))
+    
+    def _schedule_render(self):
+        if not self._render_pending:
+            self._render_pending = True
+            self.after_idle(self._render)
+    
+    def _commit_edit(self):
+        """
+        Salva la cella in modifica finché lo slot "rK" punta ancora allo stesso
+        video: va chiamato prima di cambiare self._top o di togliere righe.
+        Le aggiunte in coda non spostano nulla e lasciano l'editor aperto.
+        """
+        if self.tree._entry:
+            self.tree._finish_edit()
+    
+    def _render(self):
+        """Ridisegna solo le righe visibili."""
+        self._render_pending = False
+        
+        n = len(self.videos)
+        count = min(n, self._visible_count())
+        top = max(0, min(self._top, n - count))
+        editing = self.tree._editing_item
+        if top != self._top or (editing and int(editing[1:]) >= count):
+            self._commit_edit()  # la mappatura slot -> video sta per cambiare
+        self._top = top
+        
+        slots = self.tree.get_children()
+        if len(slots) > count:
+            self.tree.delete(*slots[count:])
+        for k in range(len(slots), count):
+            self.tree.insert("", tk.END, iid=f"r{k}")
+        
+        selected = []
+        for k in range(count):
+            v = self.videos[self._top + k]
+            self.tree.item(f"r{k}", values=(v.file_path, v.title, v.tags, v.status))
+            if v.file_path in self._selected:
+                selected.append(f"r{k}")
+        self.tree.selection_set(selected)
+        
+        self.scroll_y.set(*((self._top / n, (self._top + count) / n) if n else (0, 1)))
+    
+    def _set_top(self, top: int):
+        top = max(0, min(top, len(self.videos) - self._visible_count()))
+        if top != self._top:
+            self._commit_edit()
+            self._top = top
+            self._render()
+    
+    def _see(self, idx: int):
+        count = self._visible_count()
+        if idx < self._top:
+            self._set_top(idx)
+        elif idx >= self._top + count:
+            self._set_top(idx - count + 1)
+    
+    def _yview(self, *args):
+        """Comando della scrollbar verticale ("moveto" / "scroll")."""
+        if args[0] == "moveto":
+            self._set_top(int(float(args[1]) * len(self.videos)))
+        elif args[0] == "scroll":
+            step = int(args[1])
+            if args[2] == "pages":
+                step *= self._visible_count()
+            self._set_top(self._top + step)
+    
+    def _on_wheel(self, event):
+        if event.num == 4:
+            step = -3
+        elif event.num == 5:
+            step = 3
+        else:
+            step = -3 if event.delta > 0 else 3
+        self._set_top(self._top + step)
+        return "break"
+    
+    def _on_select(self, event=None):
+        """Riporta la selezione delle righe visibili su self._selected."""
+        selection = set(self.tree.selection())
+        for k, iid in enumerate(self.tree.get_children()):
+            if self._top + k >= len(self.videos):
+                break
+            path = self.videos[self._top + k].file_path
+            if iid in selection:
+                self._selected.add(path)
+            else:
+                self._selected.discard(path)
+    
+    def _on_cell_edit(self, iid: str, column: str, value: str):
+        idx = self._top + int(iid[1:])
+        if idx < len(self.videos):
+            setattr(self.videos[idx], column, value)
+    
+    def _apply_ui(self, done: int, total: int, item_id: int, status: str,
+                  stage: Optional[str] = None, pct: Optional[int] = None):
+        """Aggiorna contatore, barre e stato di un elemento in un'unica callback Tk."""
+        self.progress_count.config(text=f"{done}/{total}")
+        self.progress_bar.config(value=done / total * 100)
+        self._update_item_status(item_id, status)
+        if stage is not None:
+            self.progress_label.config(text=stage)
+        if pct is not None:
+            self.current_progress.config(value=pct)
+    
+    def _set_current_progress(self, stage: str, percent: int):
+        self.progress_label.config(text=stage)
+        self.current_progress.config(value=percent)
     
     def _start_upload(self):
         """Avvia l'upload."""
@@ -410,30 +660,34 @@ class BulkTab(ttk.Frame):
     
     def _run_upload(self, dry_run: bool):
         """Esegue l'upload in un thread separato."""
-        items = self._get_all_items()
-        
-        if not items:
+        if not self.videos:
             messagebox.showwarning("Attenzione", "Aggiungi almeno un video alla lista.")
             return
         
-        # Valida che ogni video abbia almeno un tag (global o specifico)
+        # Valida che ogni video abbia almeno un tag (global o specifico).
+        # I tag globali sono invarianti: prefisso calcolato una volta sola.
+        # Un solo passaggio su self.videos valida e prepara la coda.
         global_tags = self.global_tags_var.get().strip()
-        for item_id, values in items:
-            file_path, title, tags, status = values
-            combined_tags = ", ".join(filter(None, [global_tags, tags]))
+        prefix = global_tags + ", " if global_tags else ""
+        jobs = []
+        for item_id, video in enumerate(self.videos):
+            file_path, title, tags, status = video.file_path, video.title, video.tags, video.status
+            filename = os.path.basename(file_path)
+            combined_tags = prefix + tags if tags else global_tags
             if not combined_tags:
                 messagebox.showwarning(
                     "Attenzione", 
-                    f"Il video '{Path(file_path).name}' non ha tag.\n\n"
+                    f"Il video '{filename}' non ha tag.\n\n"
                     "Inserisci tag globali o specifici per ogni video."
                 )
                 return
             if not title.strip():
                 messagebox.showwarning(
                     "Attenzione",
-                    f"Il video '{Path(file_path).name}' non ha un titolo."
+                    f"Il video '{filename}' non ha un titolo."
                 )
                 return
+            jobs.append((item_id, (file_path, title, combined_tags, status)))
         
         self.is_processing = True
         self.should_stop = False
@@ -443,65 +697,95 @@ class BulkTab(ttk.Frame):
         
         thread = threading.Thread(
             target=self._process_queue,
-            args=(items, dry_run),
+            args=(jobs, dry_run),
             daemon=True
         )
         thread.start()
     
     def _process_queue(self, items: List[tuple], dry_run: bool):
-        """Processa la coda di video."""
+        """Processa la coda di video (più video in parallelo); i tag sono già combinati."""
         total = len(items)
         completed = 0
         failed = 0
-        global_tags = self.global_tags_var.get().strip()
+        duplicates = 0
+        try:
+            workers = max(1, int(self.workers_var.get()))
+        except (tk.TclError, ValueError):
+            workers = DEFAULT_BULK_WORKERS
         
         mode_str = "🧪 TEST" if dry_run else "🚀 UPLOAD"
-        self.log(f"{mode_str} - Inizio elaborazione di {total} video...")
+        self.log(f"{mode_str} - Inizio elaborazione di {total} video ({workers} in parallelo)...")
         
-        for idx, (item_id, values) in enumerate(items):
+        def process(idx: int, item_id: int, values: tuple, filename: str) -> Optional[IngestResult]:
             if self.should_stop:
-                self.log("⏹️ Upload interrotto dall'utente")
-                break
+                return None  # Saltato
             
-            file_path, title, tags, _ = values
-            combined_tags = ", ".join(filter(None, [global_tags, tags]))
+            file_path, title, combined_tags, _ = values
             
-            # Aggiorna UI
-            self.after(0, lambda: self.progress_count.config(text=f"{idx + 1}/{total}"))
-            self.after(0, lambda v=(idx / total * 100): self.progress_bar.config(value=v))
-            self.after(0, lambda iid=item_id: self._update_item_status(iid, "⚙️ Elaborazione..."))
+            # Aggiorna UI (una sola callback per elemento)
+            self.after(0, self._apply_ui, completed + failed + duplicates, total, item_id, "⚙️ Elaborazione...", "", 0)
             
-            filename = Path(file_path).name
             self.log(f"[{idx + 1}/{total}] {filename}")
             
+            last = [None, None]
+            
             def progress_cb(stage: str, percent: int):
-                self.after(0, lambda s=stage, p=percent: [
-                    self.progress_label.config(text=s),
-                    self.current_progress.config(value=p)
-                ])
+                if not self._ui_throttle.allow(last, stage, percent):
+                    return
+                if workers > 1:
+                    stage = f"{filename}: {stage}"
+                self.after(0, self._set_current_progress, stage, percent)
             
-            # Esegui ingest
-            result = ingest_video(
+            return ingest_video(
                 file_path=file_path,
                 title=title.strip(),
                 tags=combined_tags,
                 skip_compress=False,
                 dry_run=dry_run,
                 progress_callback=progress_cb,
+                log_callback=lambda line: self.log(f"  ffmpeg: {line}"),
             )
-            
-            if result.success:
-                completed += 1
-                status = "✅ Completato" if not dry_run else "✅ Test OK"
-                self.after(0, lambda iid=item_id, s=status: self._update_item_status(iid, s))
-                self.log(f"  ✅ {filename} - OK")
-            else:
-                failed += 1
-                error_short = result.error[:50] + "..." if len(result.error or "") > 50 else result.error
-                self.after(0, lambda iid=item_id, e=error_short: self._update_item_status(iid, f"❌ {e}"))
-                self.log(f"  ❌ {filename} - {result.error}")
         
-        # Completa
+        with ThreadPoolExecutor(max_workers=workers) as ex:
+            futs = {}
+            for idx, (item_id, values) in enumerate(items):
+                filename = os.path.basename(values[0])
+                futs[ex.submit(process, idx, item_id, values, filename)] = (item_id, filename)
+            stopped = False
+            for fut in as_completed(futs):
+                if self.should_stop and not stopped:
+                    stopped = True
+                    for pending in futs:
+                        pending.cancel()
+                    self.log("⏹️ Upload interrotto dall'utente")
+                if fut.cancelled():
+                    continue
+                
+                item_id, filename = futs[fut]
+                try:
+                    result = fut.result()
+                except Exception as e:
+                    result = IngestResult(success=False, error=str(e))
+                if result is None:
+                    continue
+                
+                if result.duplicate:
+                    duplicates += 1
+                    self.after(0, self._apply_ui, completed + failed + duplicates, total, item_id, "🔁 Già presente")
+                    self.log(f"  🔁 {filename} - già presente (video_id {result.video_id})")
+                elif result.success:
+                    completed += 1
+                    status = "✅ Completato" if not dry_run else "✅ Test OK"
+                    self.after(0, self._apply_ui, completed + failed + duplicates, total, item_id, status)
+                    self.log(f"  ✅ {filename} - OK")
+                else:
+                    failed += 1
+                    error_short = result.error[:50] + "..." if len(result.error or "") > 50 else result.error
+                    self.after(0, self._apply_ui, completed + failed + duplicates, total, item_id, f"❌ {error_short}")
+                    self.log(f"  ❌ {filename} - {result.error}")
+        
+        # Completa (un solo salvataggio della cache ffprobe per tutto il bulk)
+        flush_ffprobe_cache()
         self.after(0, lambda: self.progress_bar.config(value=100))
         self.after(0, lambda: self.current_progress.config(value=0))
         self.after(0, lambda: self.progress_label.config(text="Completato"))
@@ -509,8 +793,9 @@ class BulkTab(ttk.Frame):
         summary = f"\n{'=' * 40}\n"
         summary += f"📊 RIEPILOGO\n"
         summary += f"  ✅ Completati: {completed}\n"
+        summary += f"  🔁 Già presenti: {duplicates}\n"
         summary += f"  ❌ Falliti: {failed}\n"
-        summary += f"  ⏭️ Saltati: {total - completed - failed}\n"
+        summary += f"  ⏭️ Saltati: {total - completed - failed - duplicates}\n"
         summary += f"{'=' * 40}"
         self.log(summary)
         
@@ -542,6 +827,10 @@ class SingleTab(ttk.Frame):
         self.title_var = tk.StringVar()
         self.tags_var = tk.StringVar()
         self.skip_compress = tk.BooleanVar(value=False)
+        # Progresso legato a variabili Tk: il widget si ridisegna solo se il valore cambia
+        self.progress_var = tk.DoubleVar(value=0)
+        self.progress_text = tk.StringVar(value="")
+        self._ui_throttle = ProgressThrottle()
         
         self._create_widgets()
     
@@ -606,25 +895,31 @@ class SingleTab(ttk.Frame):
         self.test_btn.pack(side=tk.RIGHT, expand=True, fill=tk.X, padx=5)
         
         # === Progress ===
-        self.progress_label = ttk.Label(self, text="")
+        self.progress_label = ttk.Label(self, textvariable=self.progress_text)
         self.progress_label.pack(anchor=tk.W)
         
-        self.progress = ttk.Progressbar(self, mode="determinate")
+        self.progress = ttk.Progressbar(self, mode="determinate", variable=self.progress_var)
         self.progress.pack(fill=tk.X, pady=5)
     
     def _browse_file(self):
-        filetypes = [
-            ("Video", "*.mp4 *.mov *.avi *.mkv *.webm *.m4v"),
-            ("Tutti i file", "*.*")
-        ]
-        path = filedialog.askopenfilename(filetypes=filetypes)
+        path = filedialog.askopenfilename(filetypes=VIDEO_FILETYPES)
         if path:
             self.file_path.set(path)
             self._analyze_video(path)
             # Auto-genera titolo
-            self.title_var.set(clean_filename_to_title(Path(path).name))
+            self.title_var.set(clean_filename_to_title(os.path.basename(path)))
     
     def _analyze_video(self, path: str):
+        """Esegue ffprobe in un thread (non blocca la GUI) e aggiorna l'etichetta."""
+        self.video_info_label.config(text="⏳ Analisi...")
+        threading.Thread(target=self._analyze_video_worker, args=(path,), daemon=True).start()
+    
+    def _show_video_info(self, path: str, text: str):
+        # Ignora risultati di un file selezionato in precedenza
+        if self.file_path.get() == path:
+            self.video_info_label.config(text=text)
+    
+    def _analyze_video_worker(self, path: str):
         try:
             info = ffprobe(Path(path))
             cap = choose_cap(info.duration_seconds)
@@ -634,11 +929,10 @@ class SingleTab(ttk.Frame):
             compliant = is_mp4_container(info.container) and info.video_codec == "h264"
             status = "✅ Già ottimizzato" if compliant else "⚠️ Verrà ricodificato"
             
-            self.video_info_label.config(
-                text=f"📊 {info.width}x{info.height} | {duration_min}:{duration_sec:02d} | {info.video_codec.upper()} | Cap: {cap}p | {status}"
-            )
+            text = f"📊 {info.width}x{info.height} | {duration_min}:{duration_sec:02d} | {info.video_codec.upper()} | Cap: {cap}p | {status}"
         except Exception as e:
-            self.video_info_label.config(text=f"❌ Errore analisi: {e}")
+            text = f"❌ Errore analisi: {e}"
+        self.after(0, self._show_video_info, path, text)
     
     def _validate(self) -> bool:
         if not self.file_path.get():
@@ -676,11 +970,16 @@ class SingleTab(ttk.Frame):
             mode = "🧪 TEST" if dry_run else "🚀 UPLOAD"
             self.log(f"{mode} - Inizio...")
             
+            last = [None, None]
+            
             def progress_cb(stage: str, percent: int):
-                self.after(0, lambda: [
-                    self.progress_label.config(text=stage),
-                    self.progress.config(value=percent)
-                ])
+                # Scritture delle variabili Tk marshallate sul main loop (niente lambda/config)
+                previous_stage = last[0]
+                if not self._ui_throttle.allow(last, stage, percent):
+                    return
+                if stage != previous_stage:
+                    self.after(0, self.progress_text.set, stage)
+                self.after(0, self.progress_var.set, percent)
             
             result = ingest_video(
                 file_path=self.file_path.get(),
@@ -689,9 +988,16 @@ class SingleTab(ttk.Frame):
                 skip_compress=self.skip_compress.get(),
                 dry_run=dry_run,
                 progress_callback=progress_cb,
+                log_callback=lambda line: self.log(f"  ffmpeg: {line}"),
             )
             
-            if result.success:
+            if result.duplicate:
+                self.log(f"🔁 Video già presente (video_id {result.video_id}), nessun upload")
+                self.after(0, lambda vid=result.video_id: messagebox.showinfo(
+                    "Già presente",
+                    f"Questo video è già stato caricato.\n\nvideo_id: {vid}"
+                ))
+            elif result.success:
                 self.log("✅ Completato con successo!")
                 if not dry_run:
                     self.after(0, lambda: messagebox.showinfo(
@@ -707,14 +1013,15 @@ class SingleTab(ttk.Frame):
             self.log(f"❌ Errore: {error_msg}")
             self.after(0, lambda msg=error_msg: messagebox.showerror("Errore", msg))
         finally:
+            flush_ffprobe_cache()
             self.after(0, self._upload_finished)
     
     def _upload_finished(self):
         self.is_uploading = False
         self.upload_btn.config(state=tk.NORMAL)
         self.test_btn.config(state=tk.NORMAL)
-        self.progress.config(value=0)
-        self.progress_label.config(text="")
+        self.progress_var.set(0)
+        self.progress_text.set("")
 
 
 class GhostStreamGUI:
@@ -726,7 +1033,31 @@ class GhostStreamGUI:
         self.root.geometry("800x700")
         self.root.minsize(600, 500)
         
+        # Log thread-safe: i worker accodano, il main loop Tk svuota ogni 100 ms
+        self._log_queue: "queue.Queue[str]" = queue.Queue()
+        self._log_lines = 0  # righe nel widget (max LOG_MAX_LINES)
+        
         self._create_widgets()
+        self.root.after(100, self._drain_log)
+        
+        # Pre-riscalda i client R2/Supabase mentre l'utente compila il form
+        threading.Thread(target=self._prewarm_clients, daemon=True).start()
+    
+    def _prewarm_clients(self):
+        """Crea in background i client condivisi da tutti gli upload della sessione."""
+        for factory in (get_r2_client, get_supabase_client):
+            try:
+                factory()
+            except ImportError as e:
+                # boto3/supabase sono importati qui, non all'avvio: senza non si carica nulla
+                self.root.after(0, self._missing_dependency, e)
+                return
+            except Exception:
+                pass  # env incompleto: l'errore emergerà al primo upload
+    
+    def _missing_dependency(self, e: ImportError):
+        show_missing_dependency(e)
+        self.root.destroy()
     
     def _create_widgets(self):
         # Frame principale
@@ -764,23 +1095,48 @@ class GhostStreamGUI:
         log_scroll = ttk.Scrollbar(log_frame)
         log_scroll.pack(side=tk.RIGHT, fill=tk.Y)
         
+        log_scroll_x = ttk.Scrollbar(log_frame, orient=tk.HORIZONTAL)
+        log_scroll_x.pack(side=tk.BOTTOM, fill=tk.X)
+        
+        # wrap=NONE: niente reflow delle righe a ogni inserimento
         self.log_text = tk.Text(
             log_frame, 
             height=8, 
             state=tk.DISABLED, 
             font=("Courier", 10),
-            yscrollcommand=log_scroll.set
+            wrap=tk.NONE,
+            yscrollcommand=log_scroll.set,
+            xscrollcommand=log_scroll_x.set
         )
         self.log_text.pack(fill=tk.BOTH, expand=True)
         log_scroll.config(command=self.log_text.yview)
+        log_scroll_x.config(command=self.log_text.xview)
     
     def _log(self, message: str):
-        """Aggiunge un messaggio al log."""
-        self.log_text.config(state=tk.NORMAL)
-        self.log_text.insert(tk.END, message + "\n")
-        self.log_text.see(tk.END)
-        self.log_text.config(state=tk.DISABLED)
-        self.root.update_idletasks()
+        """Aggiunge un messaggio al log (chiamabile da qualsiasi thread)."""
+        self._log_queue.put(message)
+    
+    def _drain_log(self):
+        """Scrive nel widget i messaggi in coda, con un solo insert."""
+        batch = []
+        try:
+            while len(batch) < 200:
+                batch.append(self._log_queue.get_nowait())
+        except queue.Empty:
+            pass
+        if batch:
+            self.log_text.config(state=tk.NORMAL)
+            text = "\n".join(batch) + "\n"
+            self.log_text.insert(tk.END, text)
+            self._log_lines += text.count("\n")
+            if self._log_lines > LOG_MAX_LINES:
+                # Scarta le righe più vecchie
+                excess = self._log_lines - LOG_MAX_LINES
+                self.log_text.delete("1.0", f"{excess + 1}.0")
+                self._log_lines = LOG_MAX_LINES
+            self.log_text.see(tk.END)
+            self.log_text.config(state=tk.DISABLED)
+        self.root.after(100, self._drain_log)
 
 
 def main():
@@ -13,7 +13,8 @@ create table if not exists public.videos (
 
   published boolean not null default true,
 
-  -- Encrypted metadata (AES-256-GCM envelope serialized as base64 JSON string)
+  -- Encrypted metadata (AES-256-GCM envelope, base64 of 0x01 || iv || ct+tag;
+  -- older rows may hold the legacy base64 JSON envelope)
   -- The platform MUST NOT store plaintext titles.
   title_enc text not null,
 
@@ -26,11 +27,19 @@ create table if not exists public.videos (
   r2_video_key text not null unique,
   r2_thumb_key text not null unique,
 
+  -- SHA-256 (hex) of the stored MP4; object keys are derived from it (dedup)
+  content_sha256 text,
+
   -- Optional hints for clients
   video_mime_type text not null default 'video/mp4',
   thumb_mime_type text not null default 'image/jpeg'
 );
 
+-- Upgrade path for databases created before content-addressed keys
+alter table public.videos add column if not exists content_sha256 text;
+create unique index if not exists videos_content_sha256_key
+  on public.videos (content_sha256);
+
 create index if not exists videos_created_at_id_idx
   on public.videos (created_at desc, id desc);
 
@@ -66,6 +75,42 @@ create table if not exists public.video_tag_tokens (
 create index if not exists video_tag_tokens_tag_hmac_idx
   on public.video_tag_tokens (tag_hmac);
 
+-- Ingest helper: video row + tag tokens in a single call (and a single transaction).
+create or replace function public.insert_video_with_tags(v jsonb, tags text[])
+returns uuid
+language plpgsql
+set search_path = public
+as $$
+declare
+  new_id uuid;
+begin
+  insert into public.videos (
+    title_enc, duration_seconds, width, height,
+    r2_bucket, r2_video_key, r2_thumb_key, content_sha256, published
+  )
+  values (
+    v->>'title_enc',
+    (v->>'duration_seconds')::integer,
+    (v->>'width')::integer,
+    (v->>'height')::integer,
+    v->>'r2_bucket',
+    v->>'r2_video_key',
+    v->>'r2_thumb_key',
+    v->>'content_sha256',
+    coalesce((v->>'published')::boolean, true)
+  )
+  returning id into new_id;
+
+  insert into public.video_tag_tokens (video_id, tag_hmac)
+  select distinct new_id, t from unnest(tags) as t;
+
+  return new_id;
+end;
+$$;
+
+-- Only the service role (ingest script) may call it.
+revoke execute on function public.insert_video_with_tags(jsonb, text[]) from public, anon, authenticated;
+
 -- 3) Rate limiting ledger (sliding window)
 -- We log requests per user and endpoint; Edge Functions count requests in the last 60s.
 create table if not exists public.api_requests (
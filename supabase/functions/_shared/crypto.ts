@@ -59,15 +59,29 @@ export type AesGcmEnvelopeV1 = {
   ct_b64: string; // ciphertext + tag, as produced by AESGCM in many libs
 };
 
+// Binary envelope: 0x01 || iv(12) || ciphertext+tag. JSON envelopes start with "{".
+const ENVELOPE_BINARY_V1 = 0x01;
+const GCM_IV_BYTES = 12;
+
+function parseEnvelope(envelopeB64: string): { iv: Uint8Array; ct: Uint8Array } {
+  const raw = base64ToBytes(envelopeB64);
+  if (raw[0] === ENVELOPE_BINARY_V1) {
+    if (raw.byteLength <= 1 + GCM_IV_BYTES) throw new Error("Invalid encryption envelope");
+    return { iv: raw.subarray(1, 1 + GCM_IV_BYTES), ct: raw.subarray(1 + GCM_IV_BYTES) };
+  }
+
+  const env = JSON.parse(new TextDecoder().decode(raw)) as Partial<AesGcmEnvelopeV1>;
+  if (!env || env.v !== 1 || env.alg !== "A256GCM" || !env.iv_b64 || !env.ct_b64) {
+    throw new Error("Invalid encryption envelope");
+  }
+  return { iv: base64ToBytes(env.iv_b64), ct: base64ToBytes(env.ct_b64) };
+}
+
 export async function aesGcmDecryptEnvelopeB64(
   envelopeB64: string,
   keyB64: string,
 ): Promise<string> {
-  const envJson = new TextDecoder().decode(base64ToBytes(envelopeB64));
-  const env = JSON.parse(envJson) as Partial<AesGcmEnvelopeV1>;
-  if (!env || env.v !== 1 || env.alg !== "A256GCM" || !env.iv_b64 || !env.ct_b64) {
-    throw new Error("Invalid encryption envelope");
-  }
+  const { iv, ct } = parseEnvelope(envelopeB64);
 
   const keyBytes = base64ToBytes(keyB64);
   if (keyBytes.byteLength !== 32) throw new Error("AES key must be 32 bytes (base64)");
@@ -80,8 +94,6 @@ export async function aesGcmDecryptEnvelopeB64(
     ["decrypt"],
   );
 
-  const iv = base64ToBytes(env.iv_b64);
-  const ct = base64ToBytes(env.ct_b64);
   const ptBuf = await crypto.subtle.decrypt({ name: "AES-GCM", iv }, cryptoKey, ct);
   return new TextDecoder().decode(new Uint8Array(ptBuf));
 }
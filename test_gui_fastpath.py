@@ -0,0 +1,59 @@
+"""Tests for gui_fastpath.py (pure Python, no Tk needed)."""
+
+import random
+import unittest
+
+import gui_fastpath
+from gui_fastpath import _clean_fast, _clean_regex, _stem, clean_filename_to_title
+
+
+class StemTest(unittest.TestCase):
+    def test_matches_pathlib(self):
+        from pathlib import Path
+
+        for name in ("video.mp4", "a.b.mkv", ".hidden", "noext", "trailing.", "x.", "..", "archive.tar.gz"):
+            self.assertEqual(_stem(name), Path(name).stem, name)
+
+
+class CleanTitleTest(unittest.TestCase):
+    CASES = [
+        "video_divertente_01",
+        "001 - intro",
+        "001_-_intro",
+        "12abc",
+        "123",
+        "  spazi   multipli  ",
+        " 12 inizio con spazio",
+        "--__--",
+        "città_ÉTÉ-über",
+        "٣٤ cifre arabe",
+        "tab\tnew\nline",
+        "",
+    ]
+
+    def test_fast_matches_regex_reference(self):
+        for stem in self.CASES:
+            self.assertEqual(_clean_fast(stem), _clean_regex(stem), repr(stem))
+
+    def test_fast_matches_regex_on_random_stems(self):
+        rng = random.Random(0)
+        alphabet = "ab Z09_-\t  é٣"
+        for _ in range(5000):
+            stem = "".join(rng.choice(alphabet) for _ in range(rng.randint(0, 12)))
+            self.assertEqual(_clean_fast(stem), _clean_regex(stem), repr(stem))
+
+    def test_clean_filename_to_title(self):
+        self.assertEqual(clean_filename_to_title("video_divertente_01.mp4"), "Video Divertente 01")
+        self.assertEqual(clean_filename_to_title("003_la-mia_clip.MOV"), "La Mia Clip")
+        # Solo numeri: meglio il nome originale che un titolo vuoto
+        self.assertEqual(clean_filename_to_title("20240501.mp4"), "20240501")
+
+    def test_filetypes_cover_video_exts(self):
+        patterns = gui_fastpath.VIDEO_FILETYPES[0][1].split()
+        for ext in gui_fastpath.VIDEO_EXTS:
+            self.assertIn(f"*{ext}", patterns)
+            self.assertIn(f"*{ext.upper()}", patterns)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,357 @@
+"""Tests for ingest.py (no ffmpeg/ffprobe or network needed: subprocesses are mocked)."""
+
+import base64
+import hmac
+import os
+import tempfile
+import threading
+import unittest
+from collections import namedtuple
+from pathlib import Path
+from unittest import mock
+
+import ingest
+
+
+class DetectHwEncoderTest(unittest.TestCase):
+    def setUp(self):
+        ingest.detect_hw_encoder.cache_clear()
+        self.addCleanup(ingest.detect_hw_encoder.cache_clear)
+
+    def detect(self, hwaccels, encoders, works=(), vaapi_present=True):
+        with mock.patch.object(ingest, "is_apple_silicon", return_value=False), \
+             mock.patch.object(ingest, "probe_ffmpeg_hw", return_value=(frozenset(hwaccels), frozenset(encoders))), \
+             mock.patch.object(ingest, "hw_encoder_works", side_effect=lambda enc: enc in works) as probe, \
+             mock.patch.object(ingest, "probe_ffmpeg_filters", return_value=frozenset()), \
+             mock.patch.object(ingest.os.path, "exists", return_value=vaapi_present):
+            return ingest.detect_hw_encoder(), probe
+
+    def test_listed_but_unusable_nvenc_falls_back_to_x264(self):
+        encoder, probe = self.detect({"cuda"}, {"h264_nvenc", "libx264"})
+        self.assertEqual(encoder, "x264")
+        probe.assert_called_once_with("nvenc")
+
+    def test_first_working_hw_encoder_wins(self):
+        encoder, _ = self.detect(
+            {"cuda", "qsv", "vaapi"}, {"h264_nvenc", "h264_qsv", "h264_vaapi"}, works={"qsv", "vaapi"}
+        )
+        self.assertEqual(encoder, "qsv")
+
+    def test_vaapi_needs_render_node(self):
+        encoder, probe = self.detect({"vaapi"}, {"h264_vaapi"}, works={"vaapi"}, vaapi_present=False)
+        self.assertEqual(encoder, "x264")
+        probe.assert_not_called()
+
+    def test_apple_silicon_uses_videotoolbox(self):
+        with mock.patch.object(ingest, "is_apple_silicon", return_value=True):
+            self.assertEqual(ingest.detect_hw_encoder(), "videotoolbox")
+
+    def test_missing_ffmpeg_means_x264(self):
+        with mock.patch.object(ingest, "is_apple_silicon", return_value=False), \
+             mock.patch.object(ingest, "probe_ffmpeg_hw", side_effect=OSError):
+            self.assertEqual(ingest.detect_hw_encoder(), "x264")
+
+
+class EncodeFallbackTest(unittest.TestCase):
+    INP = ingest.ProbeInfo(60.0, 1920, 1080, "hevc", "aac", "matroska,webm", 30.0)
+
+    def test_hw_failure_retries_with_x264(self):
+        cmds = []
+
+        def fake_run(cmd, on_line=None):
+            cmds.append(cmd)
+            if len(cmds) == 1:
+                raise RuntimeError("Command failed")
+
+        with mock.patch.object(ingest, "detect_hw_encoder", return_value="nvenc"), \
+             mock.patch.object(ingest, "run", side_effect=fake_run):
+            used = ingest.encode_mp4(Path("in.mkv"), Path("out.mp4"), Path("t.jpg"), self.INP, 720)
+        self.assertEqual(used, "x264")
+        self.assertIn("h264_nvenc", cmds[0])
+        self.assertIn("libx264", cmds[1])
+
+    def test_x264_failure_is_not_retried(self):
+        with mock.patch.object(ingest, "detect_hw_encoder", return_value="x264"), \
+             mock.patch.object(ingest, "run", side_effect=RuntimeError("boom")) as run:
+            with self.assertRaises(RuntimeError):
+                ingest.encode_mp4(Path("in.mkv"), Path("out.mp4"), Path("t.jpg"), self.INP, 720)
+        self.assertEqual(run.call_count, 1)
+
+
+class WorkDirRootTest(unittest.TestCase):
+    Usage = namedtuple("Usage", "total used free")
+
+    def root(self, free, src_size, env=None, override=None):
+        with mock.patch.dict(os.environ, env or {}, clear=False), \
+             mock.patch.object(ingest.os.path, "isdir", return_value=True), \
+             mock.patch.object(ingest.shutil, "disk_usage", return_value=self.Usage(0, 0, free)):
+            if not env:
+                os.environ.pop("GS_TMPDIR", None)
+            return ingest.work_dir_root(src_size, override)
+
+    def test_shm_with_room(self):
+        self.assertEqual(self.root(free=1 << 30, src_size=100 << 20), "/dev/shm")
+
+    def test_small_shm_falls_back_to_system_temp(self):
+        # Docker default: 64 MB /dev/shm, 50 MB source
+        self.assertEqual(self.root(free=64 << 20, src_size=50 << 20), tempfile.gettempdir())
+
+    def test_overrides(self):
+        self.assertEqual(self.root(free=0, src_size=1, env={"GS_TMPDIR": "/scratch"}), "/scratch")
+        self.assertEqual(self.root(free=0, src_size=1, override="/cli"), "/cli")
+
+
+class UploadAsIsTest(unittest.TestCase):
+    def probe(self, streams, tags):
+        fake = {"streams": streams, "format": {"format_name": ingest.MP4_FORMAT_NAME, "duration": "10.0", "tags": tags}}
+        with mock.patch.object(ingest.shutil, "which", return_value="/usr/bin/ffprobe"), \
+             mock.patch.object(ingest, "run_json", return_value=fake):
+            return ingest._run_ffprobe("in.mp4")
+
+    V = {"codec_type": "video", "codec_name": "h264", "width": 1280, "height": 720, "r_frame_rate": "30/1"}
+    A = {"codec_type": "audio", "codec_name": "aac"}
+    MP4_TAGS = {"major_brand": "isom ", "minor_version": "512", "compatible_brands": "isomiso2avc1mp41", "encoder": "Lavf60"}
+
+    def test_clean_mp4_is_uploaded_as_is(self):
+        self.assertTrue(ingest.can_upload_as_is(self.probe([self.V, self.A], self.MP4_TAGS)))
+        self.assertTrue(ingest.can_upload_as_is(self.probe([self.V], self.MP4_TAGS)))
+
+    def test_quicktime_brand_is_remuxed(self):
+        self.assertFalse(ingest.can_upload_as_is(self.probe([self.V, self.A], {**self.MP4_TAGS, "major_brand": "qt  "})))
+
+    def test_extra_streams_are_remuxed(self):
+        data = {"codec_type": "data", "codec_name": "bin_data"}
+        self.assertFalse(ingest.can_upload_as_is(self.probe([self.V, self.A, self.A], self.MP4_TAGS)))
+        self.assertFalse(ingest.can_upload_as_is(self.probe([self.V, self.A, data], self.MP4_TAGS)))
+
+    def test_metadata_is_remuxed(self):
+        phone = {**self.MP4_TAGS, "creation_time": "2024-05-01T10:00:00Z", "location": "+45.4642+009.1900/"}
+        self.assertFalse(ingest.can_upload_as_is(self.probe([self.V, self.A], phone)))
+
+    def test_remux_strips_global_metadata(self):
+        inp = self.probe([self.V, self.A], self.MP4_TAGS)
+        cmd = ingest.build_remux_cmd(Path("in.mov"), Path("out.mp4"), Path("t.jpg"), inp)
+        self.assertIn("-map_metadata", cmd)
+        self.assertEqual(cmd[cmd.index("-map_metadata") + 1], "-1")
+
+    def test_predicted_container_matches_ffprobe(self):
+        inp = self.probe([self.V, self.A], self.MP4_TAGS)
+        self.assertIs(ingest.predict_output_info(inp, 1080, reencoded=False, as_is=True), inp)
+        out = ingest.predict_output_info(inp, 1080, reencoded=False)
+        self.assertEqual(out.container, ingest.MP4_FORMAT_NAME)
+        self.assertTrue(ingest.can_upload_as_is(out))
+
+
+class RotationTest(unittest.TestCase):
+    # Phone portrait clip: coded landscape, displayed 1080x1920
+    def probe(self, **extra):
+        vs = {"codec_type": "video", "codec_name": "h264", "width": 1920, "height": 1080, "r_frame_rate": "30/1", **extra}
+        fake = {"streams": [vs], "format": {"format_name": ingest.MP4_FORMAT_NAME, "duration": "10.0"}}
+        with mock.patch.object(ingest.shutil, "which", return_value="/usr/bin/ffprobe"), \
+             mock.patch.object(ingest, "run_json", return_value=fake):
+            return ingest._run_ffprobe("in.mp4")
+
+    def test_displaymatrix_swaps_dimensions(self):
+        inp = self.probe(side_data_list=[{"side_data_type": "Display Matrix", "rotation": -90}])
+        self.assertEqual((inp.width, inp.height, inp.rotation), (1080, 1920, 270))
+
+    def test_legacy_rotate_tag(self):
+        inp = self.probe(tags={"rotate": "90"})
+        self.assertEqual((inp.width, inp.height, inp.rotation), (1080, 1920, 90))
+        upside_down = self.probe(tags={"rotate": "180"})
+        self.assertEqual((upside_down.width, upside_down.height), (1920, 1080))
+
+    def test_portrait_is_downscaled_on_the_long_side(self):
+        inp = self.probe(tags={"rotate": "90"})
+        out = ingest.predict_output_info(inp, 720, reencoded=True)
+        # 1080 * 720 / 1920 = 405 -> ffmpeg's scale=-2 rounds half up to 406
+        self.assertEqual((out.width, out.height), (406, 720))
+
+    def test_landscape_downscale_width(self):
+        inp = ingest.ProbeInfo(60.0, 1920, 1080, "hevc", "aac", "matroska,webm", 30.0)
+        self.assertEqual(ingest.predict_output_info(inp, 720, reencoded=True).width, 1280)
+        self.assertEqual(ingest.predict_output_info(inp, 480, reencoded=True).width, 854)
+
+    def test_rotated_source_decodes_on_cpu(self):
+        inp = self.probe(tags={"rotate": "90"})
+        with mock.patch.object(ingest, "probe_ffmpeg_filters", return_value=frozenset({"scale", "scale_cuda"})):
+            cmd = ingest.build_encode_cmd(Path("in.mp4"), Path("out.mp4"), Path("t.jpg"), inp, 720, "nvenc")
+        self.assertNotIn("-hwaccel", cmd)
+        self.assertIn("scale=-2:'min(720,ih)'", cmd)
+        self.assertNotIn("hwdownload,format=nv12,scale=-2:360", cmd)
+        self.assertEqual(cmd[cmd.index("-pix_fmt") + 1], "nv12")
+
+
+class EncodeSlotsTest(unittest.TestCase):
+    def count(self, encoder, cpus=16, env=None):
+        with mock.patch.dict(os.environ, env or {}, clear=False), \
+             mock.patch.object(ingest.os, "cpu_count", return_value=cpus):
+            if not env:
+                os.environ.pop("GS_ENCODE_SLOTS", None)
+            return ingest.encode_slot_count(encoder)
+
+    def test_slots_follow_the_encoder_not_the_cpu(self):
+        self.assertEqual(self.count("videotoolbox"), 1)
+        self.assertEqual(self.count("nvenc", cpus=64), 3)
+        self.assertEqual(self.count("qsv", cpus=64), 2)
+        self.assertEqual(self.count("x264", cpus=64), 2)
+        self.assertEqual(self.count("x264", cpus=4), 1)
+
+    def test_env_override(self):
+        self.assertEqual(self.count("x264", env={"GS_ENCODE_SLOTS": "4"}), 4)
+        self.assertEqual(self.count("x264", cpus=4, env={"GS_ENCODE_SLOTS": "0"}), 1)
+
+
+class FfprobeDiskCacheTest(unittest.TestCase):
+    INFO = ingest.ProbeInfo(10.0, 1280, 720, "h264", "aac", ingest.MP4_FORMAT_NAME, 30.0, stream_types=("video", "audio"))
+
+    def setUp(self):
+        td = tempfile.TemporaryDirectory()
+        self.addCleanup(td.cleanup)
+        self.path = Path(td.name) / "ffprobe.json"
+        for name, value in (("FFPROBE_CACHE_PATH", self.path), ("_ffprobe_disk", None), ("_ffprobe_disk_dirty", False)):
+            patcher = mock.patch.object(ingest, name, value)
+            patcher.start()
+            self.addCleanup(patcher.stop)
+
+    def test_puts_are_written_once_per_flush(self):
+        with mock.patch.object(ingest.os, "replace", wraps=os.replace) as replace:
+            for i in range(50):
+                ingest._ffprobe_disk_put(f"k{i}", self.INFO)
+            self.assertFalse(self.path.exists())
+            ingest.flush_ffprobe_cache()
+            ingest.flush_ffprobe_cache()  # nothing new: no write
+        self.assertEqual(replace.call_count, 1)
+        self.assertEqual(list(self.path.parent.glob("*.tmp")), [])
+
+    def test_round_trip(self):
+        ingest._ffprobe_disk_put("k", self.INFO)
+        ingest.flush_ffprobe_cache()
+        ingest._ffprobe_disk = None  # fresh process
+        self.assertEqual(ingest._ffprobe_disk_get("k"), self.INFO)
+
+
+class HmacManyTest(unittest.TestCase):
+    def test_matches_hmac_new(self):
+        tokens = [b"", b"musica", "città".encode("utf-8"), b"x" * 1000]
+        for key in (b"", b"k" * 32, b"k" * 64, b"k" * 65, os.urandom(100)):
+            expected = [hmac.new(key, t, "sha256").hexdigest() for t in tokens]
+            self.assertEqual(ingest.hmac_many(tokens, key), expected)
+
+
+class ParseTagsTest(unittest.TestCase):
+    def test_normalizes_like_the_edge_functions(self):
+        self.assertEqual(ingest.parse_tags("  Musica, LIVE ,, ,città "), ["musica", "live", "città"])
+        self.assertEqual(ingest.parse_tags(" , "), [])
+
+
+class DuplicateShortCircuitTest(unittest.TestCase):
+    INP = ingest.ProbeInfo(60.0, 1280, 720, "h264", "aac", ingest.MP4_FORMAT_NAME, 30.0)
+
+    def test_known_content_is_not_uploaded_again(self):
+        td = tempfile.TemporaryDirectory()
+        self.addCleanup(td.cleanup)
+        src = Path(td.name) / "clip.mkv"
+        src.write_bytes(b"source")
+
+        def fake_encode(src, out_mp4, out_jpg, inp, cap, on_line=None):
+            out_mp4.write_bytes(b"encoded")
+            out_jpg.write_bytes(b"jpg")
+            return "x264"
+
+        key = base64.b64encode(bytes(32)).decode()
+        with mock.patch.dict(os.environ, {"GS_AES_KEY_B64": key, "GS_TAG_HMAC_KEY_B64": key}), \
+             mock.patch.object(ingest, "ensure_ffmpeg"), \
+             mock.patch.object(ingest, "ffprobe", return_value=self.INP), \
+             mock.patch.object(ingest, "encode_slots", return_value=threading.BoundedSemaphore(1)), \
+             mock.patch.object(ingest, "encode_mp4", side_effect=fake_encode), \
+             mock.patch.object(ingest, "get_supabase_client"), \
+             mock.patch.object(ingest, "find_video_by_sha256", return_value="vid-1") as find, \
+             mock.patch.object(ingest, "get_r2_client") as r2, \
+             mock.patch.object(ingest, "upload_media_r2") as upload, \
+             mock.patch.object(ingest, "insert_video_with_tags") as insert:
+            result = ingest.ingest_video(str(src), "Titolo", "tag1", tmp_dir=td.name)
+
+        digest = ingest.hashlib.sha256(b"encoded").hexdigest()
+        find.assert_called_once_with(mock.ANY, digest)
+        self.assertTrue(result.success)
+        self.assertTrue(result.duplicate)
+        self.assertEqual(result.video_id, "vid-1")
+        self.assertEqual(result.video_key, f"videos/{digest[:2]}/{digest}.mp4")
+        r2.assert_not_called()
+        upload.assert_not_called()
+        insert.assert_not_called()
+
+
+class SingleFlightInitTest(unittest.TestCase):
+    def setUp(self):
+        ingest.encode_slots.cache_clear()
+        self.addCleanup(ingest.encode_slots.cache_clear)
+
+    def test_concurrent_first_callers_share_one_semaphore(self):
+        calls = []
+
+        def slow_detect():
+            calls.append(1)
+            threading.Event().wait(0.05)  # hardware test encode running
+            return "videotoolbox"
+
+        results = []
+        with mock.patch.object(ingest, "detect_hw_encoder", side_effect=slow_detect):
+            threads = [threading.Thread(target=lambda: results.append(ingest.encode_slots())) for _ in range(8)]
+            for t in threads:
+                t.start()
+            for t in threads:
+                t.join()
+        self.assertEqual(len(calls), 1)
+        self.assertEqual(len({id(r) for r in results}), 1)
+
+
+class UploadProgressTest(unittest.TestCase):
+    def test_progress_fires_once_per_percent(self):
+        td = tempfile.TemporaryDirectory()
+        self.addCleanup(td.cleanup)
+        video, thumb = Path(td.name) / "v.mp4", Path(td.name) / "t.jpg"
+        video.write_bytes(bytes(8192 * 1000))
+        thumb.write_bytes(bytes(8192))
+
+        def fake_upload(r2, bucket, key, path, content_type, dry_run, callback, skip_existing):
+            for _ in range(path.stat().st_size // 8192):  # boto3: one callback per ~8 KB read
+                callback(8192)
+
+        seen = []
+        with mock.patch.object(ingest, "upload_file_r2", side_effect=fake_upload):
+            ingest.upload_media_r2(None, "b", "v", video, "t", thumb, False, on_progress=lambda d, t: seen.append(d * 100 // t))
+        self.assertLessEqual(len(seen), 101)
+        self.assertEqual(seen, sorted(set(seen)))
+        self.assertEqual(seen[-1], 100)
+
+
+class NvencScaleFilterTest(unittest.TestCase):
+    INP = ingest.ProbeInfo(60.0, 1920, 1080, "h264", "aac", ingest.MP4_FORMAT_NAME, 30.0)
+
+    def cmd(self, filters):
+        with mock.patch.object(ingest, "probe_ffmpeg_filters", return_value=frozenset(filters)):
+            return ingest.build_encode_cmd(Path("in.mp4"), Path("out.mp4"), Path("t.jpg"), self.INP, 720, "nvenc")
+
+    def vf(self, cmd):
+        return cmd[cmd.index("-vf") + 1]
+
+    def test_prefers_scale_cuda(self):
+        cmd = self.cmd({"scale", "scale_cuda", "scale_npp"})
+        self.assertTrue(self.vf(cmd).startswith("scale_cuda="))
+        self.assertIn("-hwaccel", cmd)
+
+    def test_scale_npp_on_nonfree_builds(self):
+        self.assertTrue(self.vf(self.cmd({"scale", "scale_npp"})).startswith("scale_npp="))
+
+    def test_no_gpu_scaler_scales_on_cpu_and_encodes_on_nvenc(self):
+        cmd = self.cmd({"scale"})
+        self.assertNotIn("-hwaccel", cmd)
+        self.assertEqual(self.vf(cmd), "scale=-2:'min(720,ih)'")
+        self.assertEqual(cmd[cmd.index("-c:v") + 1], "h264_nvenc")
+        self.assertEqual(cmd[cmd.index("-pix_fmt") + 1], "nv12")
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,158 @@
+"""Tests for the virtualized bulk table in ingest_gui.py (no display needed: the Treeview is faked)."""
+
+import queue
+import unittest
+from unittest import mock
+
+from ingest_gui import BulkTab, EditableTreeview, ProgressThrottle, VideoItem
+
+
+class FakeEntry:
+    def __init__(self, value: str):
+        self.value = value
+
+    def get(self) -> str:
+        return self.value
+
+    def destroy(self):
+        pass
+
+
+class FakeTree:
+    """Slot "rK" di un Treeview senza Tk; editing con la stessa logica di EditableTreeview."""
+
+    _finish_edit = EditableTreeview._finish_edit
+    _cleanup_edit = EditableTreeview._cleanup_edit
+
+    def __init__(self, on_edit, rows: int):
+        self._on_edit = on_edit
+        self._column_names = {"#1": "file", "#2": "title", "#3": "tags", "#4": "status"}
+        self._entry = None
+        self._editing_item = None
+        self._editing_column = None
+        self.rows = rows
+        self.values = {}
+
+    def start_edit(self, iid: str, column: str, typed: str):
+        self._editing_item, self._editing_column = iid, column
+        self._entry = FakeEntry(typed)
+
+    def get_children(self):
+        return tuple(self.values)
+
+    def winfo_height(self):
+        return 25 + 20 * self.rows
+
+    def bbox(self, iid):
+        return (0, 25, 100, 20)
+
+    def insert(self, parent, index, iid):
+        self.values[iid] = ()
+
+    def delete(self, *iids):
+        for iid in iids:
+            del self.values[iid]
+
+    def item(self, iid, values):
+        self.values[iid] = values
+
+    def set(self, iid, column, value=None):
+        pass
+
+    def selection_set(self, items):
+        pass
+
+
+class VirtualTableEditTest(unittest.TestCase):
+    def setUp(self):
+        self.tab = BulkTab.__new__(BulkTab)  # niente widget: solo lo stato della tabella
+        self.tab.videos = [VideoItem(file_path=f"/v/{i}.mp4", title=f"T{i}", tags="") for i in range(100)]
+        self.tab._by_path = {v.file_path: v for v in self.tab.videos}
+        self.tab._selected = set()
+        self.tab._top = 0
+        self.tab._render_pending = False
+        self.tab.is_processing = False
+        self.tab.tree = FakeTree(self.tab._on_cell_edit, rows=10)
+        self.tab.scroll_y = mock.Mock()
+        self.tab._render()
+
+    def test_edit_maps_slot_to_scrolled_row(self):
+        self.tab._set_top(40)
+        self.tab.tree.start_edit("r2", "#2", "nuovo")
+        self.tab.tree._finish_edit()
+        self.assertEqual(self.tab.videos[42].title, "nuovo")
+
+    def test_scroll_mid_edit_saves_the_edited_row(self):
+        self.tab.tree.start_edit("r3", "#2", "nuovo")
+        self.tab._on_wheel(mock.Mock(num=5))  # scroll giù di 3 righe con l'Entry aperta
+        self.assertEqual(self.tab._top, 3)
+        self.assertEqual(self.tab.videos[3].title, "nuovo")
+        self.assertEqual(self.tab.videos[6].title, "T6")
+        self.assertIsNone(self.tab.tree._entry)
+
+    def test_scrollbar_mid_edit(self):
+        self.tab.tree.start_edit("r0", "#3", "tag1")
+        self.tab._yview("moveto", "0.5")
+        self.assertEqual(self.tab.videos[0].tags, "tag1")
+        self.assertEqual(self.tab.videos[50].tags, "")
+
+    def test_appending_rows_keeps_the_editor_open(self):
+        self.tab._set_top(40)
+        self.tab.tree.start_edit("r2", "#2", "sto scrivendo")
+        for i in range(100, 300):  # scansione cartella in corso
+            self.tab.videos.append(VideoItem(file_path=f"/v/{i}.mp4", title=f"T{i}", tags=""))
+            self.tab._render()
+        self.assertIsNotNone(self.tab.tree._entry)
+        self.assertEqual(self.tab.videos[42].title, "T42")
+        self.tab.tree._finish_edit()
+        self.assertEqual(self.tab.videos[42].title, "sto scrivendo")
+
+    def test_resize_that_drops_the_edited_slot_saves_it(self):
+        self.tab.tree.start_edit("r8", "#2", "nuovo")
+        self.tab.tree.rows = 5  # finestra rimpicciolita: <Configure>
+        self.tab._render()
+        self.assertEqual(self.tab.videos[8].title, "nuovo")
+        self.assertIsNone(self.tab.tree._entry)
+
+    def test_remove_mid_edit_saves_before_the_list_shifts(self):
+        self.tab._selected = {"/v/0.mp4", "/v/1.mp4"}
+        self.tab.tree.start_edit("r5", "#2", "nuovo")
+        self.tab._remove_selected()
+        self.assertEqual(self.tab._by_path["/v/5.mp4"].title, "nuovo")
+        self.assertEqual(self.tab._by_path["/v/7.mp4"].title, "T7")
+
+
+class DrainFolderQueueTest(unittest.TestCase):
+    def test_counts_only_new_files_of_this_scan(self):
+        tab = BulkTab.__new__(BulkTab)
+        tab.videos = [VideoItem(file_path=f"/v/{i}.mp4", title=f"T{i}", tags="") for i in range(5)]
+        tab._by_path = {v.file_path: v for v in tab.videos}
+        tab._schedule_render = mock.Mock()
+        tab.after = mock.Mock()
+        tab.log = mock.Mock()
+        found = queue.Queue()
+        for path in ("/v/new1.mp4", "/v/0.mp4", "/v/new2.mp4", None):
+            found.put(path)
+        # Righe rimosse mentre la scansione era in corso: non devono falsare il conteggio
+        del tab.videos[:3]
+        tab._drain_folder_queue(found, 0)
+        tab.log.assert_called_once_with("Aggiunti 2 video dall'albero")
+
+
+class ProgressThrottleTest(unittest.TestCase):
+    def test_drops_bursts_and_repeats(self):
+        throttle = ProgressThrottle()
+        last = [None, None]
+        with mock.patch("ingest_gui.time.monotonic", return_value=100.0):
+            self.assertTrue(throttle.allow(last, "Upload su R2...", 65))
+            self.assertFalse(throttle.allow(last, "Upload su R2...", 65))  # ripetuto
+            self.assertFalse(throttle.allow(last, "Upload su R2...", 66))  # entro 1/30 s
+            self.assertTrue(throttle.allow(last, "Salvataggio database...", 90))  # cambio fase
+            self.assertTrue(throttle.allow(last, "Salvataggio database...", 100))
+        with mock.patch("ingest_gui.time.monotonic", return_value=101.0):
+            self.assertFalse(throttle.allow(last, "Salvataggio database...", 100))
+            self.assertTrue(throttle.allow(last, "Salvataggio database...", 99))
+
+
+if __name__ == "__main__":
+    unittest.main()